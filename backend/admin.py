@@ -0,0 +1,56 @@
+from flask import Blueprint, request, jsonify
+from bulk_load import bulk_load, BulkLoadError, DEFAULT_BATCH_SIZE, print_progress
+import psycopg2 as pg
+import hmac
+import io
+import os
+
+
+#----------------------------------------Blueprint Init--------------------------------------------------------------------#
+
+
+admin_bp = Blueprint("admin", __name__)
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set, requests must send it in the X-Admin-Token header
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+@admin_bp.before_request
+def require_admin_token():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled"}), 404
+    # Constant time comparison, so response timing doesn't reveal how much of a guessed token was right
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Invalid admin token"}), 403
+
+
+#-------------------------------------------Bulk Load-----------------------------------------------------------------------------------------#
+
+
+@admin_bp.route("/bulk-load/<table>", methods=["POST"])
+def bulk_load_table(table):
+    """
+    Streams the request body into table with COPY, see bulk_load.py
+    Query parameters: format=csv|ndjson, batch_size, drop_indexes=true|false
+    """
+    fmt = request.args.get("format", "csv")
+    drop_indexes = request.args.get("drop_indexes", "false").lower() == "true"
+
+    try:
+        batch_size = int(request.args.get("batch_size", DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return jsonify({"error": "batch_size must be a number"}), 400
+
+    # The body is read as it arrives, so large uploads never sit in memory all at once
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+
+    try:
+        summary = bulk_load(stream, table, fmt, batch_size, drop_indexes, print_progress(table))
+        return jsonify(summary), 200
+
+    except (BulkLoadError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    except pg.Error as e:
+        print(f"[ADMIN] Database error during bulk load into {table}: {e}")
+        return jsonify({"error": "Database error", "detail": str(e).strip()}), 500
@@ -1,8 +1,9 @@
 #---------------------Libraries and packages here---------------------------#
 
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
+from server_config import ALLOWED_ORIGINS, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS, DB_POOL_RETRY_AFTER
 import psycopg2 as pg
 import os
 #----------------------------------------------------------------------------#
@@ -10,56 +11,65 @@ import os
 
 load_dotenv()
 
-# Initialize allowed array and store all possible hosts for the frontend
-allowed = [
-    os.getenv("FRONTEND_ORIGIN", "http://localhost:3000"),
-    "http://127.0.0.1:3000",
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-]
-
 
 def create_app():
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 
+    # jsonify goes through a faster encoder that handles timestamps itself, large responses get gzip/brotli compressed
+    from serialization import init_serialization
+    init_serialization(app)
+
     CORS(
         app,
-        resources={r"/api/*": {"origins": allowed}},
+        resources={r"/api/*": {"origins": ALLOWED_ORIGINS}},
         supports_credentials=True,
         methods=["GET","POST","PUT","PATCH","DELETE","OPTIONS"],
-        allow_headers=["Content-Type","Authorization"],
-        expose_headers=["Content-Type"],
+        allow_headers=CORS_ALLOW_HEADERS,
+        expose_headers=CORS_EXPOSE_HEADERS,
         max_age=600,
     )
 
-    from auth import auth_bp, create_auth_table  
+    from auth import auth_bp
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
 
-    from blog import blog_bp, create_blog_tables
+    from blog import blog_bp
     app.register_blueprint(blog_bp, url_prefix="/api/blog")
+
+    from follows import follows_bp
+    app.register_blueprint(follows_bp, url_prefix="/api/users")
+
+    from admin import admin_bp
+    app.register_blueprint(admin_bp, url_prefix="/api/admin")
     
 
-    from db_conn import db_pool
+    from db_conn import db_pool, read_pool, PoolTimeoutError
+
+    # Per-route latency, status codes, DB time, query and row counts, plus pool usage, at GET /metrics
+    from metrics import init_metrics
+    pools = [("primary", db_pool)] + ([("replica", read_pool)] if read_pool else [])
+    init_metrics(app, pools)
+
+    # Every connection is busy and none freed up in time, tell the client to come back shortly instead of failing hard
+    @app.errorhandler(PoolTimeoutError)
+    def pool_timeout(e):
+        print(f"[APP] {e}")
+        response = jsonify({"error": "Server is busy, please try again"})
+        response.headers["Retry-After"] = str(DB_POOL_RETRY_AFTER)
+        return response, 503
     
+    # Tables are created and changed by migrations.py, run once per deploy, start up only checks the version
+    from migrations import check_schema_version
+
     conn = None
     try:
-        # Get fresh connection from pool for table creation
         conn = db_pool.getconn()
         conn.autocommit = True
-        cur = conn.cursor()
-        
-        # Create auth table
-        create_auth_table(cur)
-        
-        # Create blog tables (blogs, comments)
-        create_blog_tables(cur)
-        
-        print("[APP] All tables created successfully")
-        
+        check_schema_version(conn.cursor())
+
     except Exception as e:
-        print(f"[APP] Error creating tables: {e}")
-        
+        print(f"[APP] Error checking schema version: {e}")
+
     finally:
         # Always return connection to pool
         if conn:
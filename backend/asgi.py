@@ -0,0 +1,86 @@
+#---------------------Libraries and packages here---------------------------#
+
+from quart import Quart, request, jsonify
+from quart_cors import cors
+from server_config import ALLOWED_ORIGINS, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS, DB_POOL_RETRY_AFTER
+from serialization import FastJSONProvider, choose_encoding, compress, COMPRESS_MIN_SIZE, COMPRESSIBLE_MIMETYPES
+import os
+#----------------------------------------------------------------------------#
+
+
+# Async (ASGI) app serving the read-only blog routes, see async_blog.py
+# Needs the packages in requirements-async.txt, run from backend/ with:
+#   hypercorn asgi:app --bind 0.0.0.0:5001 --workers 2
+# with ASYNC_WORKERS matching --workers and ASYNC_DB_CONNECTIONS set, see server_config.py
+# Put it behind the same host as the Flask app and route GET /api/blog/<id>, /api/blog/search and /api/blog/query* to it.
+
+
+def create_async_app():
+    app = Quart(__name__)
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
+    app.json = FastJSONProvider(app)
+
+    cors(
+        app,
+        allow_origin=ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "OPTIONS"],
+        allow_headers=CORS_ALLOW_HEADERS,
+        expose_headers=CORS_EXPOSE_HEADERS,
+        max_age=600,
+    )
+
+    from async_blog import async_blog_bp
+    app.register_blueprint(async_blog_bp, url_prefix="/api/blog")
+
+    from async_db import async_pool, async_read_pool
+    from psycopg_pool import PoolTimeout
+
+    # Same as the Flask app: no connection freed up in time, so ask the client to retry shortly
+    @app.errorhandler(PoolTimeout)
+    async def pool_timeout(e):
+        print(f"[ASGI] {e}")
+        response = jsonify({"error": "Server is busy, please try again"})
+        response.headers["Retry-After"] = str(DB_POOL_RETRY_AFTER)
+        return response, 503
+
+    @app.before_serving
+    async def open_pool():
+        await async_pool.open()
+        if async_read_pool is not None:
+            await async_read_pool.open()
+        print("[ASGI] Connection pool opened")
+
+    @app.after_serving
+    async def close_pool():
+        await async_pool.close()
+        if async_read_pool is not None:
+            await async_read_pool.close()
+
+    # Same compression rules as serialization.compress_response, with Quart's async body access
+    @app.after_request
+    async def compress_response(response):
+        if (
+            response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        encoding = choose_encoding(request.headers.get("Accept-Encoding", "").lower())
+        if encoding is None:
+            return response
+
+        data = await response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
+
+    return app
+
+
+app = create_async_app()
@@ -0,0 +1,291 @@
+from quart import Blueprint, request, session, jsonify, make_response
+from psycopg_pool import PoolTimeout
+from async_db import async_pool, async_read_pool
+from server_config import WROTE_AT_SESSION_KEY, pinned_to_primary
+from cache import result_cache, versions_from_rows, TABLE_VERSIONS_SQL
+from queries import (
+    SearchRequestError, parse_search_request, search_sql, search_params, search_response, search_etag,
+    SEARCH_VERSION_SQL, BLOG_VERSION_SQL, BLOG_SQL, BLOG_COMMENTS_SQL, blog_etag,
+    blog_row_to_dict, comment_row_to_dict, user_row_to_dict,
+    QueryRequestError, parse_query1_tags, query1_params, query1_users,
+    query2_params, parse_query2_range, query2_range_params, query2_range_response, QUERY2_RANGE_SQL,
+    parse_common_followee_users, query3_params, parse_feed_request, feed_params, feed_response, FEED_SQL,
+    QUERY1_SQL, QUERY2_SQL, QUERY3_SQL, QUERY4_SQL, QUERY5_SQL, QUERY6_SQL, QUERY7_SQL,
+    QUERY4_TABLES, QUERY6_TABLES, QUERY7_TABLES, QUERY2_DEFAULT_DATE,
+)
+
+
+#----------------------------------------Blueprint Init--------------------------------------------------------------------#
+
+
+# Async versions of blog.py's read-only routes, served by asgi.py under the same /api/blog paths
+# They run the same SQL from queries.py and return the same payloads, only the driver and the server differ
+# Writes (create, comment) and auth stay on the Flask app, they're short and guarded by per-user rules anyway
+async_blog_bp = Blueprint('async_blog', __name__)
+
+
+#---------------------------------------------------------Helper Functions---------------------------------------------------------------#
+
+def read_pool():
+    """
+    The replica pool if there is one, unless this session wrote in the last READ_YOUR_WRITES_SECONDS
+    The session cookie is the Flask app's (same SECRET_KEY), its write routes record when the session last wrote
+    """
+    if async_read_pool is not None and not pinned_to_primary(session.get(WROTE_AT_SESSION_KEY)):
+        return async_read_pool
+    return async_pool
+
+
+async def fetch_all(sql, params=()):
+    async with read_pool().connection() as conn:
+        cur = await conn.execute(sql, params)
+        return await cur.fetchall()
+
+
+async def not_modified(etag):
+    """Returns a 304 for etag if the client's If-None-Match already holds it, otherwise None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = await make_response("", 304)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+async def users_query(name, sql, params=()):
+    """Runs a Phase 3 query that returns users, with the same error handling as the Flask routes"""
+    try:
+        rows = await fetch_all(sql, params)
+        return [user_row_to_dict(row) for row in rows]
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"[{name.upper()}] Error:", e)
+        return None
+
+
+async def cached_users_query(name, sql, tables):
+    """users_query for the parameterless queries, served from the result cache while their tables are unchanged"""
+    try:
+        async with read_pool().connection() as conn:
+            # Read on the connection the query runs on, before it, see cache.py
+            cur = await conn.execute(TABLE_VERSIONS_SQL, (list(tables),))
+            versions = versions_from_rows(tables, await cur.fetchall())
+
+            cached = result_cache.get(name, versions)
+            if cached is not None:
+                return jsonify(cached), 200
+
+            cur = await conn.execute(sql)
+            rows = await cur.fetchall()
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"[{name.upper()}] Error:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    payload = {"users": [user_row_to_dict(row) for row in rows]}
+    result_cache.put(name, versions, payload)
+    return jsonify(payload), 200
+
+
+#-----------------------------------------------------Search/View----------------------------------------------------------------------#
+
+@async_blog_bp.route('/search', methods=['GET', 'POST'])
+async def search_blogs():
+    if request.method == 'POST':
+        data = await request.get_json(force=True)
+    else:
+        data = request.args
+
+    try:
+        search = parse_search_request(data)
+    except SearchRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with read_pool().connection() as conn:
+        # Conditional requests only for GET, like blog.py
+        etag = None
+        if request.method == 'GET':
+            cur = await conn.execute(SEARCH_VERSION_SQL)
+            etag = search_etag(search, await cur.fetchone())
+            cached = await not_modified(etag)
+            if cached:
+                return cached
+
+        cur = await conn.execute(search_sql(search["mode"]), search_params(search))
+        results = await cur.fetchall()
+
+    response = jsonify(search_response(search, results))
+    return (with_etag(response, etag) if etag else response), 200
+
+
+@async_blog_bp.route('/feed', methods=['GET'])
+async def home_feed():
+    username = session.get('username')
+    if not username:
+        return jsonify({"error": "Please log in first to see your feed"}), 401
+
+    try:
+        feed = parse_feed_request(request.args)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = await fetch_all(FEED_SQL, feed_params(username, feed))
+    return jsonify(feed_response(feed, rows)), 200
+
+
+@async_blog_bp.route('/<int:blog_id>', methods=['GET'])
+async def get_blog(blog_id):
+    async with read_pool().connection() as conn:
+        cur = await conn.execute(BLOG_VERSION_SQL, (blog_id,))
+        version = await cur.fetchone()
+
+        if not version:
+            return jsonify({"error": "Blog not found"}), 404
+
+        etag = blog_etag(blog_id, version)
+        cached = await not_modified(etag)
+        if cached:
+            return cached
+
+        cur = await conn.execute(BLOG_SQL, (blog_id,))
+        blog_row = await cur.fetchone()
+
+        if not blog_row:
+            return jsonify({"error": "Blog not found"}), 404
+
+        cur = await conn.execute(BLOG_COMMENTS_SQL, (blog_id,))
+        comment_rows = await cur.fetchall()
+
+    blog = blog_row_to_dict(blog_row)
+    blog["comments"] = [comment_row_to_dict(comment) for comment in comment_rows]
+    return with_etag(jsonify(blog), etag), 200
+
+
+#-----------------------------------------------------Phase 3----------------------------------------------------------------------#
+
+@async_blog_bp.route("/query1", methods=["POST"])
+async def query1_same_day_tags():
+    data = await request.get_json(silent=True) or {}
+
+    try:
+        tags = parse_query1_tags(data)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        rows = await fetch_all(QUERY1_SQL, query1_params(tags))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print("[QUERY1] Error:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    return jsonify({"users": query1_users(tags, rows)}), 200
+
+
+@async_blog_bp.route("/query2", methods=["GET"])
+async def query2_most_blogs_on_date():
+    target_date = request.args.get("date", QUERY2_DEFAULT_DATE)
+
+    try:
+        date_range = parse_query2_range(request.args)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        if date_range:
+            rows = await fetch_all(QUERY2_RANGE_SQL, query2_range_params(date_range))
+        else:
+            rows = await fetch_all(QUERY2_SQL, query2_params(target_date))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print("[QUERY2] Error:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    if date_range:
+        return jsonify(query2_range_response(date_range, rows)), 200
+
+    users = [
+        {
+            "username": row[0],
+            "firstname": row[1],
+            "lastname": row[2],
+            "blog_count": row[3],
+            "date": target_date,
+        }
+        for row in rows
+    ]
+    return jsonify({"users": users, "date": target_date}), 200
+
+
+@async_blog_bp.route("/query3", methods=["POST"])
+async def query3_followed_by_both():
+    data = await request.get_json(silent=True) or {}
+
+    if "users" in data:
+        try:
+            usernames = parse_common_followee_users(data["users"])
+        except QueryRequestError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        user_x = data.get("userX")
+        user_y = data.get("userY")
+
+        if not user_x or not user_y:
+            return jsonify({"error": "Both userX and userY are required"}), 400
+
+        if user_x == user_y:
+            return jsonify({"error": "userX and userY must be different users"}), 400
+
+        usernames = [user_x, user_y]
+
+    # Always the SQL intersection, the follow graph cache lives in the Flask workers that handle follow/unfollow
+    users = await users_query("query3", QUERY3_SQL, query3_params(usernames))
+    if users is None:
+        return jsonify({"error": "Internal server error"}), 500
+    return jsonify({"users": users, "userX": usernames[0], "userY": usernames[1], "usernames": usernames}), 200
+
+
+@async_blog_bp.route("/query4", methods=["GET"])
+async def query4_users_never_posted():
+    return await cached_users_query("query4", QUERY4_SQL, QUERY4_TABLES)
+
+
+@async_blog_bp.route("/query5", methods=["POST"])
+async def query5_user_blogs_all_positive():
+    data = await request.get_json(silent=True) or {}
+    username = data.get("username")
+
+    if not username:
+        return jsonify({"error": "username is required"}), 400
+
+    try:
+        rows = await fetch_all(QUERY5_SQL, (username,))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print("[QUERY5] Error:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    blogs = [blog_row_to_dict(row) for row in rows]
+    return jsonify({"username": username, "blogs": blogs}), 200
+
+
+@async_blog_bp.route("/query6", methods=["GET"])
+async def query6_users_only_negative_comments():
+    return await cached_users_query("query6", QUERY6_SQL, QUERY6_TABLES)
+
+
+@async_blog_bp.route("/query7", methods=["GET"])
+async def query7_users_no_negative_on_blogs():
+    return await cached_users_query("query7", QUERY7_SQL, QUERY7_TABLES)
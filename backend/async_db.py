@@ -0,0 +1,59 @@
+from psycopg_pool import AsyncConnectionPool
+from psycopg.conninfo import make_conninfo
+from server_config import async_pool_maxconn, READ_REPLICA_ENABLED, read_replica_settings
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
+
+
+# Async counterpart of db_conn.py for the ASGI app (asgi.py), built on psycopg 3 which uses the same %s placeholders as psycopg2
+# Requests don't hold a thread while they wait on Postgres, so one process can have thousands in flight;
+# they queue for one of max_size connections, waiting up to ASYNC_DB_POOL_TIMEOUT seconds
+# max_size is this worker's share of ASYNC_DB_CONNECTIONS (server_config.py), which the gunicorn workers' budget
+# excludes, so both apps running together stay within DB_MAX_CONNECTIONS
+
+ASYNC_DB_POOL_MAX = async_pool_maxconn()
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "10"))
+
+CONNECTION_OPTIONS = {
+    "connect_timeout": 10,
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
+conninfo = make_conninfo(
+    dbname=os.getenv("DB_NAME"),
+    user=os.getenv("DB_USER"),
+    password=os.getenv("DB_PASS"),
+    host=os.getenv("DB_HOST"),
+    port=os.getenv("DB_PORT"),
+    sslmode=os.getenv("DB_SSLMODE", "require"),
+    **CONNECTION_OPTIONS
+)
+
+# Opened and closed by the app's before_serving/after_serving hooks, so it is bound to the server's event loop
+async_pool = AsyncConnectionPool(
+    conninfo,
+    min_size=1,
+    max_size=ASYNC_DB_POOL_MAX,
+    timeout=ASYNC_DB_POOL_TIMEOUT,
+    kwargs={"autocommit": True},
+    open=False,
+)
+
+# Read replica pool, None unless DB_READ_HOST is set, every route of the async app reads from it
+# unless the session is inside its read-your-writes window (see async_blog.read_pool)
+async_read_pool = None
+if READ_REPLICA_ENABLED:
+    async_read_pool = AsyncConnectionPool(
+        make_conninfo(**read_replica_settings(), **CONNECTION_OPTIONS),
+        min_size=1,
+        max_size=ASYNC_DB_POOL_MAX,
+        timeout=ASYNC_DB_POOL_TIMEOUT,
+        kwargs={"autocommit": True},
+        open=False,
+    )
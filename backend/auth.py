@@ -1,7 +1,15 @@
 from flask import Blueprint, redirect, request, session, url_for, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as HashTimeoutError
+import threading
 import psycopg2 as pg
-from db_conn import db_pool
+import os
+from db_conn import db_pool, PoolTimeoutError
+from routing import request_pool, read_only, writes
+from cache import bump_version
+from counters import read_counters
+import prepared
 
 
 #----------------------------------------Blueprint Init and DB Connection--------------------------------------------------------------------#
@@ -13,6 +21,63 @@ from db_conn import db_pool
 auth_bp = Blueprint("auth", __name__)
 
 
+#----------------------------------------Password Hashing--------------------------------------------------------------------#
+
+# Hash method handed to werkzeug, ex: "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+# Changing it does not need a migration, existing hashes are upgraded the next time their owner logs in
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+
+# Hashing is CPU heavy, so it runs on a small dedicated executor instead of however many request threads happen to log in at once
+# HASH_WORKERS caps how many hashes run in parallel, HASH_QUEUE_LIMIT caps how many may wait, anything past that gets a 503
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "10"))
+
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pw-hash")
+hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+# werkzeug expands short methods ("scrypt") to their full form ("scrypt:32768:8:1") in the stored hash,
+# hashing once at start up gives the exact prefix to compare stored hashes against
+CURRENT_HASH_PREFIX = generate_password_hash("", method=PASSWORD_HASH_METHOD).split("$", 1)[0]
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing executor is saturated or a hash takes longer than HASH_TIMEOUT"""
+
+
+def run_hashing(func, *args):
+    # Claims a slot before submitting so bursts are turned away instead of piling up in the executor's unbounded queue
+    if not hash_slots.acquire(blocking=False):
+        raise HashingBusyError()
+
+    # The slot is held until the hash itself finishes, a request that timed out leaves its hash queued or running,
+    # releasing on timeout would let the executor's backlog grow past HASH_QUEUE_LIMIT
+    try:
+        future = hash_executor.submit(func, *args)
+    except BaseException:
+        hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: hash_slots.release())
+
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except HashTimeoutError:
+        raise HashingBusyError()
+
+
+def hash_password(password):
+    return run_hashing(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(pw_hash, password):
+    return run_hashing(check_password_hash, pw_hash, password)
+
+
+def needs_rehash(pw_hash):
+    # True when the stored hash was made with a different method or different parameters than PASSWORD_HASH_METHOD
+    return pw_hash.split("$", 1)[0] != CURRENT_HASH_PREFIX
+
+
 # Creates the table for authentication, does not create it if it already exists in the database
 # Gets called at app start up
 def create_auth_table(cursor):
@@ -28,28 +93,42 @@ def create_auth_table(cursor):
     """)
 
 
+# Hashed password lookup run by every login, prepared once per pooled connection (see prepared.py)
+LOGIN_PASSWORD = prepared.register("login_password", "SELECT password FROM auth WHERE username = %s", ("varchar",))
+
+
+# Maps the auth table's unique constraints (Postgres' default names) to the field and message sent to the frontend
+AUTH_CONSTRAINT_CONFLICTS = {
+    "auth_pkey": ("username", "Account with inputted username already exists"),
+    "auth_email_key": ("email", "Account with inputted email already exists"),
+    "auth_phone_key": ("phone", "Account with inputted phone number already exists"),
+}
+
+
 # All parameters are optional
 def check_if_account_exists(cursor, username: str = None, email: str = None, phone: str = None) -> dict:
     
     # Checks if the inputted username, email, or phone number already exists
     # Returns dict with which fields are already registered
-    # SELECT 1 is used instead of an actual result (ex: SELECT *) for the query since its faster for this purpose (just finding out if something is there)
+    # One query with OR'd conditions, each condition is served by its own unique index
     conflicts = {}
-    
-    if username:
-        cursor.execute("SELECT 1 FROM auth WHERE username = %s", (username,))  
-        if cursor.fetchone():
-            conflicts["username"] = "Account with inputted username already exists" 
-    
-    if email:
-        cursor.execute("SELECT 1 FROM auth WHERE email = %s", (email,))
-        if cursor.fetchone():
-            conflicts["email"] = "Account with inputted email already exists"
-    
-    if phone:
-        cursor.execute("SELECT 1 FROM auth WHERE phone = %s", (phone,))
-        if cursor.fetchone():
-            conflicts["phone"] = "Account with inputted phone number already exists"
+
+    cursor.execute("""
+        SELECT
+            BOOL_OR(username = %s),
+            BOOL_OR(email = %s),
+            BOOL_OR(phone = %s)
+        FROM auth
+        WHERE username = %s OR email = %s OR phone = %s
+    """, (username, email, phone, username, email, phone))
+    username_taken, email_taken, phone_taken = cursor.fetchone()
+
+    if username_taken:
+        conflicts["username"] = AUTH_CONSTRAINT_CONFLICTS["auth_pkey"][1]
+    if email_taken:
+        conflicts["email"] = AUTH_CONSTRAINT_CONFLICTS["auth_email_key"][1]
+    if phone_taken:
+        conflicts["phone"] = AUTH_CONSTRAINT_CONFLICTS["auth_phone_key"][1]
     
     return conflicts
 
@@ -58,6 +137,7 @@ def check_if_account_exists(cursor, username: str = None, email: str = None, pho
 
 
 @auth_bp.route("/register", methods=["POST"])
+@writes
 def register():
     conn = None
     try:
@@ -76,19 +156,16 @@ def register():
         if not all([username, password, first_name, last_name, email, phone]):
             return jsonify({"error": "Missing required fields"}), 400
 
+        # Hashed before taking a connection so the connection isn't held idle while the CPU works
+        pw_hash = hash_password(password)
+
         conn = db_pool.getconn()
         conn.autocommit = True
         cur = conn.cursor()
 
-        # Initialize conflicts here so that it can return each conflict to the frontend
-        conflicts = check_if_account_exists(cur, username, email, phone)
-        if conflicts:
-            return jsonify({"error": list(conflicts.values())}), 409
-
-        pw_hash = generate_password_hash(password)
-
 
         # Tries to insert values into auth table, outputs username as a result of DDL 
+        # No pre-check queries, the PRIMARY KEY/UNIQUE constraints reject duplicates atomically (see UniqueViolation below)
         cur.execute(
             """
             INSERT INTO auth (username, password, firstName, lastName, email, phone)
@@ -106,9 +183,28 @@ def register():
         if not new_user:
             return jsonify({"error": "Insert failed"}), 500
 
+        bump_version(cur, "auth")
+
         return jsonify({"message": "Registration successful", "username": new_user[0]}), 201
 
     
+    except HashingBusyError:
+        return jsonify({"error": "Server is busy, please try again"}), 503
+
+    # The insert hit a unique constraint, only now do we look up every conflicting field so the frontend can show them all
+    # If that row is already gone again, the violated constraint's name still tells us which field it was
+    except pg.errors.UniqueViolation as e:
+        # The lookup is only for a nicer message, if it fails the violated constraint alone still answers the request
+        try:
+            conflicts = check_if_account_exists(cur, username, email, phone)
+        except pg.Error as lookup_error:
+            print(f"Database error while looking up registration conflicts: {lookup_error}")
+            conflicts = {}
+        if not conflicts and e.diag.constraint_name in AUTH_CONSTRAINT_CONFLICTS:
+            field, message = AUTH_CONSTRAINT_CONFLICTS[e.diag.constraint_name]
+            conflicts[field] = message
+        return jsonify({"error": list(conflicts.values()) or ["Account already exists"]}), 409
+
     # If any error occurs while inserting values into DB return an error and print what the error is to the console. 
     # Insert is atomic so no need to tell DB to rollback, it is either all or none
     except pg.Error as e:
@@ -142,26 +238,47 @@ def login():
         conn.autocommit = True
         cur = conn.cursor()
         
-        conflicts = check_if_account_exists(cur, username=username)
-        if not conflicts:
-            return jsonify({"error": "Account associated with inputted username does not exist."}), 404
-
-        # Fetches hashed password stored in database 
-        cur.execute("SELECT password FROM auth WHERE username = %s", (username,))
+        # Fetches hashed password stored in database, no row means the account does not exist
+        prepared.execute(cur, LOGIN_PASSWORD, (username,))
         row = cur.fetchone()
 
+        # The connection goes back to the pool before hashing so it isn't held idle while the CPU works
+        db_pool.putconn(conn)
+        conn = None
 
-        # if statement gives pw_hash the 'None' value if there is nothing in the fetched row which prevents it from crashing if there is row has no value at all
-        pw_hash = row[0] if row else None
+        if not row:
+            return jsonify({"error": "Account associated with inputted username does not exist."}), 404
 
+        pw_hash = row[0]
 
-        if not pw_hash or not check_password_hash(pw_hash, password):
+        if not pw_hash or not verify_password(pw_hash, password):
             return jsonify({"error": "Incorrect Password"}), 401
-        
+
+        # Upgrades the stored hash to the current PASSWORD_HASH_METHOD, now that we have the plaintext
+        # Matching on the old hash makes sure a password changed in the meantime is never overwritten
+        # Best effort, the password was correct so a busy hash pool or failed update never blocks the login,
+        # the upgrade is simply tried again next time
+        if needs_rehash(pw_hash):
+            try:
+                new_hash = hash_password(password)
+                conn = db_pool.getconn()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(
+                    "UPDATE auth SET password = %s WHERE username = %s AND password = %s",
+                    (new_hash, username, pw_hash),
+                )
+            except (HashingBusyError, PoolTimeoutError):
+                print(f"[AUTH] Server busy, skipped upgrading the password hash of {username}")
+            except pg.Error as e:
+                print(f"Database error while upgrading password hash: {e}")
 
         # stores username in user session, persists across requests
         session["username"] = username
         return jsonify({"message": "Login Successful!"})
+
+    except HashingBusyError:
+        return jsonify({"error": "Server is busy, please try again"}), 503
     
     except pg.Error as e:
         print(f"Database error while logging in: {e}")
@@ -181,22 +298,12 @@ def logout():
 
 
 @auth_bp.route("/_debug/count")
+@read_only
 def _debug_count():
-    conn = None
     try:
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cur = conn.cursor()
-
-        # Fetches number of rows (users) in auth and returns the number, for admin use
-        cur.execute("SELECT COUNT(*) FROM auth")
-        n = cur.fetchone()[0]
-        return jsonify({"count": n})
+        # Number of rows (users) in auth, for admin use, from the same cached counters as /api/blog/_debug/counters
+        return jsonify({"count": read_counters(request_pool())["users"]})
     
     except pg.Error as e:
         print(f"Database error: {e}")
         return jsonify({"error": "Database error"}), 500
-    
-    finally:
-        if conn:
-            db_pool.putconn(conn)
\ No newline at end of file
@@ -0,0 +1,137 @@
+#---------------------Libraries and packages here---------------------------#
+
+from migrations import MIGRATIONS
+from bulk_load import load_rows, print_progress
+from werkzeug.security import generate_password_hash
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+import random
+#----------------------------------------------------------------------------#
+
+
+# Generates a reproducible, realistically skewed dataset for the Phase 3 benchmarks (see phase3.py)
+#   - tags follow a Zipf distribution, a handful of tags are on most blogs and there is a long tail
+#   - authors are heavy-tailed, a few users write most of the blogs and most users write one or none
+#   - followers are heavy-tailed, a few users are followed by a large share of everyone
+# The same seed and scale always produce the same rows.
+
+
+# Named scales accepted by --scale, number of users
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+BLOGS_PER_USER = 3
+COMMENTS_PER_BLOG = 2
+FOLLOWS_PER_USER = 10
+TAG_VOCABULARY = 2_000
+DAYS = 365
+POSITIVE_RATIO = 0.7
+ZIPF_EXPONENT = 1.1
+
+START_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_cum_weights(n, rng=None, exponent=ZIPF_EXPONENT):
+    """
+    Cumulative weights for ids 0..n-1 under a Zipf distribution, for random.choices(cum_weights=...)
+    Without rng id 0 is the most likely, with rng the ranks are shuffled across ids first
+    """
+    weights = [1.0 / (rank ** exponent) for rank in range(1, n + 1)]
+    if rng:
+        rng.shuffle(weights)
+    return list(accumulate(weights))
+
+
+def username(i):
+    return f"user{i}"
+
+
+def generate_users(rng, users):
+    # Every generated user shares one password hash, hashing per row would dominate generation time
+    pw_hash = generate_password_hash("password")
+    columns = ["username", "password", "firstname", "lastname", "email", "phone"]
+    for i in range(users):
+        yield columns, [username(i), pw_hash, f"First{i}", f"Last{i}", f"user{i}@bench.local", f"555{i:010d}"]
+
+
+def generate_blogs(rng, authors, tag_weights):
+    # authors[blog_id - 1] is the user id of the blog's author
+    columns = ["blog_id", "username", "subject", "description", "tags", "created_at"]
+    for blog_id, author in enumerate(authors, start=1):
+        tag_count = rng.randint(1, 4)
+        tags = {f"tag{t}" for t in rng.choices(range(TAG_VOCABULARY), cum_weights=tag_weights, k=tag_count)}
+        created_at = START_DATE + timedelta(days=rng.randrange(DAYS), seconds=rng.randrange(86_400))
+        yield columns, [
+            blog_id,
+            username(author),
+            f"Subject {blog_id}",
+            f"Generated blog {blog_id} by {username(author)}",
+            "{" + ",".join(sorted(tags)) + "}",
+            created_at.isoformat(),
+        ]
+
+
+def generate_comments(rng, users, authors_by_blog, commenter_weights):
+    # authors_by_blog[blog_id - 1] is the blog's author, used to skip self comments
+    columns = ["blog_id", "username", "sentiment", "description", "created_at"]
+    for blog_id, author in enumerate(authors_by_blog, start=1):
+        count = min(int(rng.expovariate(1 / COMMENTS_PER_BLOG)), 50)
+        if count == 0:
+            continue
+
+        # One comment per user per blog, and never on your own blog, same rules add_comment enforces
+        commenters = set(rng.choices(range(users), cum_weights=commenter_weights, k=count))
+        commenters.discard(author)
+        for commenter in sorted(commenters):
+            sentiment = "Positive" if rng.random() < POSITIVE_RATIO else "Negative"
+            created_at = START_DATE + timedelta(days=rng.randrange(DAYS), seconds=rng.randrange(86_400))
+            yield columns, [blog_id, username(commenter), sentiment, f"Comment on {blog_id}", created_at.isoformat()]
+
+
+def generate_follows(rng, users, followed_weights):
+    columns = ["follower_username", "followed_username"]
+    for follower in range(users):
+        count = min(int(rng.expovariate(1 / FOLLOWS_PER_USER)), 1_000)
+        followed = set(rng.choices(range(users), cum_weights=followed_weights, k=count))
+        followed.discard(follower)
+        for user in sorted(followed):
+            yield columns, [username(follower), username(user)]
+
+
+def generate_dataset(conn, schema, users, seed):
+    """
+    Creates schema, builds every table in it and loads the generated dataset with COPY
+    conn's search_path is left pointing at schema
+    """
+    rng = random.Random(seed)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cur.execute(f"CREATE SCHEMA {schema}")
+    cur.execute(f"SET search_path TO {schema}, public")
+    # Every migration, not just the base schema, so the benchmarks see the same tables, indexes and triggers as the app
+    for _, _, migration in MIGRATIONS:
+        migration(cur)
+
+    # Commenter and followee ranks are shuffled so the heavy authors, commenters and followees are different people
+    author_weights = zipf_cum_weights(users)
+    commenter_weights = zipf_cum_weights(users, rng)
+    followed_weights = zipf_cum_weights(users, rng)
+    tag_weights = zipf_cum_weights(TAG_VOCABULARY)
+
+    load_rows(generate_users(rng, users), "auth", progress=print_progress("auth"), conn=conn)
+
+    # Blog authors are drawn up front so comments can skip the author's own blogs
+    authors_by_blog = rng.choices(range(users), cum_weights=author_weights, k=users * BLOGS_PER_USER)
+
+    load_rows(generate_blogs(rng, authors_by_blog, tag_weights), "blogs", progress=print_progress("blogs"), conn=conn)
+    load_rows(generate_comments(rng, users, authors_by_blog, commenter_weights), "comments",
+              progress=print_progress("comments"), conn=conn)
+    load_rows(generate_follows(rng, users, followed_weights), "follows", progress=print_progress("follows"), conn=conn)
+
+    cur = conn.cursor()
+    cur.execute("ANALYZE")
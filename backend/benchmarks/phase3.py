@@ -0,0 +1,185 @@
+#---------------------Libraries and packages here---------------------------#
+
+from queries import (
+    query1_params, query2_params, query2_range_params, query3_params, QUERY2_RANGE_SQL,
+    QUERY1_SQL, QUERY2_SQL, QUERY3_SQL, QUERY4_SQL,
+    QUERY5_SQL, QUERY6_SQL, QUERY7_SQL,
+)
+from benchmarks.generate import SCALES, generate_dataset
+from db_conn import db_pool
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import subprocess
+import time
+#----------------------------------------------------------------------------#
+
+
+# Runs Phase 3 queries 1-7 against a generated dataset and records latency percentiles and EXPLAIN plans as JSON
+# Point .env at a local Postgres (never production, the dataset lives in its own schema but is large) and run:
+#   cd backend
+#   python -m benchmarks.phase3 --scale 10k
+#   python -m benchmarks.phase3 --scale 100k --reuse     (skips generation if the schema was already built)
+# Results land in benchmarks/results/ so runs before and after a change can be diffed.
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def pick_parameters(cursor):
+    """Picks parameters that hit the dataset's hot spots, so every query has real work to do"""
+    cursor.execute("""
+        SELECT t FROM blogs, unnest(tags) AS t
+        GROUP BY t ORDER BY COUNT(*) DESC LIMIT 2
+    """)
+    tag_a, tag_b = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT DATE(created_at) FROM blogs
+        GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    busiest_day = cursor.fetchone()[0]
+    month_start = busiest_day.replace(day=1)
+
+    cursor.execute("""
+        SELECT follower_username FROM follows
+        GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 2
+    """)
+    user_x, user_y = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT username FROM blogs
+        GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    top_author = cursor.fetchone()[0]
+
+    return [
+        ("query1", QUERY1_SQL, query1_params([tag_a, tag_b])),
+        ("query2", QUERY2_SQL, query2_params(busiest_day)),
+        ("query2_range", QUERY2_RANGE_SQL, query2_range_params({"start": month_start, "end": busiest_day, "top": 3})),
+        ("query3", QUERY3_SQL, query3_params([user_x, user_y])),
+        ("query4", QUERY4_SQL, ()),
+        ("query5", QUERY5_SQL, (top_author,)),
+        ("query6", QUERY6_SQL, ()),
+        ("query7", QUERY7_SQL, ()),
+    ]
+
+
+def run_query(cursor, sql, params, warmup, runs):
+    """Times sql (execute + fetchall, the same work a route does) and captures one EXPLAIN ANALYZE plan"""
+    for _ in range(warmup):
+        cursor.execute(sql, params)
+        cursor.fetchall()
+
+    timings = []
+    rows = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = len(cursor.fetchall())
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    plan = cursor.fetchone()[0][0]
+
+    return {
+        "params": list(params),
+        "rows": rows,
+        "runs": runs,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+        "plan": plan,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Phase 3 queries on a generated dataset")
+    parser.add_argument("--scale", choices=list(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=440)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--reuse", action="store_true", help="Reuse the scale's schema if it already exists")
+    parser.add_argument("--only", nargs="*", help="Only run these queries, ex: --only query1 query7")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    schema = f"bench_phase3_{args.scale}"
+    users = SCALES[args.scale]
+
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        cur.execute("SELECT to_regclass(%s)", (f"{schema}.blogs",))
+        exists = cur.fetchone()[0] is not None
+
+        if args.reuse and exists:
+            print(f"[BENCH] Reusing schema {schema}")
+        else:
+            print(f"[BENCH] Generating {args.scale} dataset into {schema} (seed {args.seed})...")
+            generate_dataset(conn, schema, users, args.seed)
+
+        cur = conn.cursor()
+        cur.execute(f"SET search_path TO {schema}, public")
+        cur.execute("SHOW server_version")
+        server_version = cur.fetchone()[0]
+
+        results = {}
+        for name, sql, params in pick_parameters(cur):
+            if args.only and name not in args.only:
+                continue
+            print(f"[BENCH] {name}...")
+            results[name] = run_query(cur, sql, params, args.warmup, args.runs)
+            print(f"[BENCH] {name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms, "
+                  f"p99 {results[name]['p99_ms']} ms, {results[name]['rows']} rows")
+
+        # search_path is reset so the connection goes back to the pool pointing at the real tables
+        cur.execute("RESET search_path")
+
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+    report = {
+        "scale": args.scale,
+        "users": users,
+        "seed": args.seed,
+        "git_commit": git_commit(),
+        "server_version": server_version,
+        "ran_at": datetime.now(timezone.utc).isoformat(),
+        "queries": results,
+    }
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"phase3-{args.scale}-{stamp}.json"
+
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"[BENCH] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#---------------------Libraries and packages here---------------------------#
+
+import prepared
+from blog import SEARCH_VERSION, SEARCH, BLOG_VERSION, BLOG, BLOG_COMMENTS
+from auth import LOGIN_PASSWORD
+from queries import parse_search_request, search_params
+from benchmarks.generate import SCALES, generate_dataset
+from benchmarks.phase3 import percentile, git_commit, RESULTS_DIR
+from db_conn import db_pool
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import time
+#----------------------------------------------------------------------------#
+
+
+# Compares the hot statements sent as inline SQL (what the routes did before prepared.py) with the same statements
+# run through the prepared statement registry, on a generated dataset:
+#   cd backend
+#   python -m benchmarks.prepared --scale 100k --reuse
+# For each statement it records round trip latency percentiles both ways and Postgres' own Planning Time,
+# which is the parse/plan overhead a prepared statement with a cached plan no longer pays.
+# Only read statements are run, create_blog and add_comment would change the dataset between runs.
+# Before that it checks the pool really keeps connections (and their prepared statements) across requests, which
+# a benchmark that holds on to one connection throughout can't show.
+
+# Schema independent, so it can be left prepared on the pool's connections
+POOL_CHECK = prepared.register("bench_pool_check", "SELECT 1")
+POOL_CHECK_CONNECTIONS = 3
+POOL_CHECK_CYCLES = 5
+
+
+def check_pool_reuse(pool):
+    """
+    Checks out several connections at once, runs POOL_CHECK on each and gives them all back, POOL_CHECK_CYCLES times
+    Raises RuntimeError if a cycle gets a connection it hasn't seen before or has to PREPARE again, ie the pool
+    closes returned connections and every request pays for a new connection and its PREPAREs
+    """
+    connections = min(POOL_CHECK_CONNECTIONS, pool.maxconn)
+    seen = {}  # id -> connection, holding on to them so an id can't be reused by a new one
+    prepares = 0
+
+    for cycle in range(POOL_CHECK_CYCLES):
+        conns = [pool.getconn() for _ in range(connections)]
+        try:
+            for conn in conns:
+                if POOL_CHECK not in prepared.prepared_names(conn):
+                    prepares += 1
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    prepared.execute(cur, POOL_CHECK)
+                    cur.fetchall()
+                seen[id(conn)] = conn
+        finally:
+            for conn in conns:
+                pool.putconn(conn)
+
+        if len(seen) > connections or prepares > connections:
+            raise RuntimeError(
+                f"Pool opened {len(seen)} connections and prepared {POOL_CHECK} {prepares} times over {cycle + 1} "
+                f"cycles of {connections} connections, returned connections are not being kept"
+            )
+
+    return {"connections": connections, "cycles": POOL_CHECK_CYCLES, "opened": len(seen), "prepares": prepares}
+
+
+def pick_parameters(cursor):
+    """One set of parameters per statement, taken from the dataset's busiest tag, blog and author"""
+    cursor.execute("""
+        SELECT t FROM blogs, unnest(tags) AS t
+        GROUP BY t ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    tag = cursor.fetchone()[0]
+
+    cursor.execute("""
+        SELECT blog_id FROM comments
+        GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    blog_id = cursor.fetchone()[0]
+
+    cursor.execute("""
+        SELECT username FROM blogs
+        GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    username = cursor.fetchone()[0]
+
+    statements = [(SEARCH_VERSION, ())]
+    for mode, name in SEARCH.items():
+        statements.append((name, search_params(parse_search_request({"tag": tag, "mode": mode}))))
+    statements += [
+        (BLOG_VERSION, (blog_id,)),
+        (BLOG, (blog_id,)),
+        (BLOG_COMMENTS, (blog_id,)),
+        (LOGIN_PASSWORD, (username,)),
+    ]
+    return statements
+
+
+def time_runs(run, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings
+
+
+def summarize(timings):
+    return {
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+    }
+
+
+def planning_time(cursor, explain_target, params):
+    cursor.execute("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + explain_target, params)
+    return cursor.fetchone()[0][0]["Planning Time"]
+
+
+def run_statement(cursor, name, params, warmup, runs):
+    sql = prepared.STATEMENTS[name][0]
+
+    def inline():
+        cursor.execute(sql, params)
+        cursor.fetchall()
+
+    def execute_prepared():
+        prepared.execute(cursor, name, params)
+        cursor.fetchall()
+
+    # Warmup also prepares the statement, and runs it past the 5 executions Postgres uses to decide on a generic plan
+    for _ in range(warmup):
+        inline()
+        execute_prepared()
+
+    inline_timings = time_runs(inline, runs)
+    prepared_timings = time_runs(execute_prepared, runs)
+
+    placeholders = f" ({', '.join(['%s'] * len(params))})" if params else ""
+    return {
+        "params": list(params),
+        "runs": runs,
+        "inline": {**summarize(inline_timings), "planning_ms": planning_time(cursor, sql, params)},
+        "prepared": {
+            **summarize(prepared_timings),
+            "planning_ms": planning_time(cursor, f"EXECUTE {name}{placeholders}", params),
+        },
+        "p50_saved_ms": round(percentile(inline_timings, 50) - percentile(prepared_timings, 50), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prepared statements against inline SQL")
+    parser.add_argument("--scale", choices=list(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=440)
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--reuse", action="store_true", help="Reuse the scale's schema if it already exists")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    # Measured regardless of DB_PREPARED_STATEMENTS, that setting is what this helps decide
+    prepared.PREPARED_STATEMENTS_ENABLED = True
+
+    schema = f"bench_phase3_{args.scale}"
+
+    pool_reuse = check_pool_reuse(db_pool)
+    print(f"[BENCH] Pool kept {pool_reuse['opened']} connections over {pool_reuse['cycles']} cycles, "
+          f"{pool_reuse['prepares']} PREPAREs")
+
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        cur.execute("SELECT to_regclass(%s)", (f"{schema}.blogs",))
+        exists = cur.fetchone()[0] is not None
+
+        if args.reuse and exists:
+            print(f"[BENCH] Reusing schema {schema}")
+        else:
+            print(f"[BENCH] Generating {args.scale} dataset into {schema} (seed {args.seed})...")
+            generate_dataset(conn, schema, SCALES[args.scale], args.seed)
+
+        cur = conn.cursor()
+        cur.execute(f"SET search_path TO {schema}, public")
+
+        results = {}
+        for name, params in pick_parameters(cur):
+            print(f"[BENCH] {name}...")
+            results[name] = run_statement(cur, name, params, args.warmup, args.runs)
+            print(f"[BENCH] {name}: inline p50 {results[name]['inline']['p50_ms']} ms "
+                  f"(planning {results[name]['inline']['planning_ms']} ms), "
+                  f"prepared p50 {results[name]['prepared']['p50_ms']} ms "
+                  f"(planning {results[name]['prepared']['planning_ms']} ms)")
+
+        # The statements were prepared against the benchmark schema, they must not follow the connection back to the pool
+        prepared.deallocate_all(cur)
+        cur.execute("RESET search_path")
+
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+    report = {
+        "scale": args.scale,
+        "seed": args.seed,
+        "git_commit": git_commit(),
+        "ran_at": datetime.now(timezone.utc).isoformat(),
+        "pool_reuse": pool_reuse,
+        "statements": results,
+    }
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"prepared-{args.scale}-{stamp}.json"
+
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"[BENCH] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#---------------------Libraries and packages here---------------------------#
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from serialization import FastJSONProvider, compress, orjson, brotli
+from datetime import datetime, timedelta, timezone
+import argparse
+import json
+import timeit
+#----------------------------------------------------------------------------#
+
+
+# Measures the CPU cost of building and encoding the largest responses, before and after serialization.py
+# Needs no database:
+#   cd backend
+#   python -m benchmarks.serialization --blogs 100 --users 10000
+
+
+def search_rows(count):
+    """Rows shaped like the search SELECT returns them"""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        (i, f"user{i % 500}", f"Subject {i}", "Lorem ipsum dolor sit amet " * 20,
+         ["tag1", "tag2", f"tag{i % 50}"], start + timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+def user_rows(count):
+    """Rows shaped like query4's SELECT returns them"""
+    return [(f"user{i}", f"First{i}", f"Last{i}") for i in range(count)]
+
+
+def legacy_search(provider, rows):
+    # What search_blogs did before: .isoformat() per row, then the stdlib encoder
+    blogs = [{"blog_id": r[0], "username": r[1], "subject": r[2], "description": r[3],
+              "tags": r[4], "created_at": r[5].isoformat()} for r in rows]
+    return provider.dumps({"tag": "tag1", "count": len(blogs), "blogs": blogs})
+
+
+def fast_search(provider, rows):
+    blogs = [{"blog_id": r[0], "username": r[1], "subject": r[2], "description": r[3],
+              "tags": r[4], "created_at": r[5]} for r in rows]
+    return provider.dumps({"tag": "tag1", "count": len(blogs), "blogs": blogs})
+
+
+def users_payload(provider, rows):
+    users = [{"username": r[0], "firstname": r[1], "lastname": r[2]} for r in rows]
+    return provider.dumps({"users": users})
+
+
+def per_call_us(func, number):
+    return round(min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark JSON encoding and compression per response")
+    parser.add_argument("--blogs", type=int, default=100, help="Blogs in the search payload")
+    parser.add_argument("--users", type=int, default=10_000, help="Users in the query4 payload")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    blogs = search_rows(args.blogs)
+    users = user_rows(args.users)
+
+    results = {
+        "orjson_installed": orjson is not None,
+        "brotli_installed": brotli is not None,
+        "search_us": {
+            "stdlib": per_call_us(lambda: legacy_search(stdlib, blogs), args.number),
+            "fast": per_call_us(lambda: fast_search(fast, blogs), args.number),
+        },
+        "query4_us": {
+            "stdlib": per_call_us(lambda: users_payload(stdlib, users), args.number),
+            "fast": per_call_us(lambda: users_payload(fast, users), args.number),
+        },
+    }
+
+    # Compression cost and payoff for the query4 payload
+    body = users_payload(fast, users).encode()
+    results["query4_bytes"] = {"raw": len(body)}
+    results["query4_compress_us"] = {}
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        results["query4_bytes"][encoding] = len(compress(body, encoding))
+        results["query4_compress_us"][encoding] = per_call_us(lambda: compress(body, encoding), max(1, args.number // 5))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
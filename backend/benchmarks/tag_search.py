@@ -0,0 +1,132 @@
+#---------------------Libraries and packages here---------------------------#
+
+from auth import create_auth_table
+from blog import create_blog_tables
+from queries import TAG_SEARCH_PREDICATES, tag_search_pattern
+from db_conn import db_pool
+import argparse
+import json
+#----------------------------------------------------------------------------#
+
+
+# Benchmarks /search's tag lookup before and after the blog_tags index
+# Everything runs inside a scratch schema that is dropped at the end, so point .env at a local Postgres and run:
+#   cd backend
+#   python -m benchmarks.tag_search --blogs 1000000
+
+
+SCHEMA = "bench_tag_search"
+
+# The predicate /search used before blog_tags existed, it has to unnest every tags array of every blog
+LEGACY_SQL = """
+    SELECT blog_id FROM blogs
+    WHERE %s = ANY(tags) OR EXISTS (
+        SELECT 1 FROM unnest(tags) AS t
+        WHERE LOWER(t) LIKE LOWER(%s)
+    )
+    ORDER BY created_at DESC, blog_id DESC
+    LIMIT 20
+"""
+
+INDEXED_SQL = """
+    SELECT blog_id FROM blogs
+    WHERE blog_id IN (
+        SELECT bt.blog_id FROM blog_tags bt
+        WHERE {predicate}
+    )
+    ORDER BY created_at DESC, blog_id DESC
+    LIMIT 20
+"""
+
+
+def seed(cursor, blogs, users, vocabulary):
+    """Builds the scratch schema and fills it with generated users and blogs, server side"""
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"SET search_path TO {SCHEMA}, public")
+
+    create_auth_table(cursor)
+    create_blog_tables(cursor)
+
+    cursor.execute("""
+        INSERT INTO auth (username, password, firstName, lastName, email, phone)
+        SELECT 'user' || i, 'x', 'First', 'Last', 'user' || i || '@bench.local', 'phone' || i
+        FROM generate_series(1, %s) AS i
+    """, (users,))
+
+    # Each blog gets 1-4 tags drawn from the vocabulary, some mixed case so the lower-casing is exercised
+    # (i %% 1) references the outer row so Postgres re-runs the tag subquery per blog instead of once
+    cursor.execute("""
+        INSERT INTO blogs (username, subject, description, tags, created_at)
+        SELECT
+            'user' || (1 + (random() * (%s - 1))::int),
+            'Subject ' || i,
+            'Description ' || i,
+            ARRAY(
+                SELECT CASE WHEN random() < 0.1 THEN 'Topic' ELSE 'topic' END || (random() * %s)::int
+                FROM generate_series(1, 1 + (random() * 3)::int + (i %% 1))
+            ),
+            now() - (random() * interval '365 days')
+        FROM generate_series(1, %s) AS i
+    """, (users, vocabulary, blogs))
+
+    cursor.execute("ANALYZE")
+
+
+def time_query(cursor, sql, params, runs):
+    """Runs EXPLAIN ANALYZE runs times and returns the median execution time in ms and the last plan"""
+    timings = []
+    plan = None
+    for _ in range(runs):
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+        result = cursor.fetchone()[0][0]
+        timings.append(result["Execution Time"])
+        plan = result["Plan"]
+
+    timings.sort()
+    return timings[len(timings) // 2], plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs indexed tag search")
+    parser.add_argument("--blogs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--vocabulary", type=int, default=5_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema after the run")
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print(f"[BENCH] Seeding {args.blogs} blogs across {args.users} users...")
+        seed(cur, args.blogs, args.users, args.vocabulary)
+
+        # A tag that exists, its prefix, and a substring from its middle
+        tag = "topic1234"
+        results = {}
+
+        legacy_ms, _ = time_query(cur, LEGACY_SQL, (tag, f"%{tag}%"), args.runs)
+        results["legacy"] = legacy_ms
+
+        lookups = {"exact": tag, "prefix": "topic12", "contains": "pic123"}
+        for mode, value in lookups.items():
+            sql = INDEXED_SQL.format(predicate=TAG_SEARCH_PREDICATES[mode])
+            ms, _ = time_query(cur, sql, (tag_search_pattern(value, mode),), args.runs)
+            results[mode] = ms
+
+        print(json.dumps({"blogs": args.blogs, "median_ms": results}, indent=2))
+
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+
+if __name__ == "__main__":
+    main()
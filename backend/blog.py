@@ -1,5 +1,21 @@
-from flask import Blueprint, request, session, jsonify
-from db_conn import db_pool
+from flask import Blueprint, request, session, jsonify, make_response
+from db_conn import db_pool, read_pool, PoolTimeoutError
+from routing import request_pool, read_only, writes
+from migrations import create_index
+from cache import result_cache, bump_version, table_versions
+from counters import read_counters, COUNTER_MODES
+from follow_graph import common_followee_rows
+import prepared
+from queries import (
+    SearchRequestError, TAG_SEARCH_PREDICATES, parse_search_request, search_sql, search_params, search_response, search_etag,
+    SEARCH_VERSION_SQL, BLOG_VERSION_SQL, BLOG_SQL, BLOG_COMMENTS_SQL, blog_etag,
+    blog_row_to_dict, comment_row_to_dict, user_row_to_dict,
+    QueryRequestError, parse_query1_tags, query1_params, query1_users,
+    query2_params, parse_query2_range, query2_range_params, query2_range_response, QUERY2_RANGE_SQL,
+    parse_common_followee_users, parse_feed_request, feed_params, feed_response, FEED_SQL,
+    QUERY1_SQL, QUERY2_SQL, QUERY4_SQL, QUERY5_SQL, QUERY6_SQL, QUERY7_SQL,
+    QUERY4_TABLES, QUERY6_TABLES, QUERY7_TABLES, QUERY2_DEFAULT_DATE,
+)
 import psycopg2 as pg
 
 
@@ -11,8 +27,16 @@ import psycopg2 as pg
 blog_bp = Blueprint('blog', __name__)
 
 
+# Lets query2 count blogs per user over a created_at range from the index alone (migration 4)
+BLOGS_CREATED_AT_USERNAME_INDEX = ("idx_blogs_created_at_username", "ON blogs(created_at) INCLUDE (username)")
+
+# Reverse of the follows primary key, serves the followers pages (follows.py) by the followed user (migration 5)
+FOLLOWS_FOLLOWED_INDEX = ("idx_follows_followed_follower", "ON follows(followed_username, follower_username)")
+
+
 # Creates the blogs and comments tables, does not create them if they already exist in the database
-# Gets called at app start up
+# Gets called by the base schema migration (migrations.py) and the benchmarks. It is migration 1, so anything
+# added to the schema later goes in its own migration instead of here
 def create_blog_tables(cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS blogs(
@@ -36,14 +60,13 @@ def create_blog_tables(cursor):
         )
     """)
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_blogs_username ON blogs(username);
-        CREATE INDEX IF NOT EXISTS idx_blogs_created_at ON blogs(created_at);
-        CREATE INDEX IF NOT EXISTS idx_blogs_tags ON blogs USING GIN(tags);
-        CREATE INDEX IF NOT EXISTS idx_comments_blog_id ON comments(blog_id);
-        CREATE INDEX IF NOT EXISTS idx_comments_username ON comments(username);
-        CREATE INDEX IF NOT EXISTS idx_comments_created_at ON comments(created_at);
-    """)
+    create_index(cursor, "idx_blogs_username", "ON blogs(username)")
+    create_index(cursor, "idx_blogs_created_at", "ON blogs(created_at)")
+    create_index(cursor, "idx_blogs_created_at_blog_id", "ON blogs(created_at DESC, blog_id DESC)")
+    create_index(cursor, "idx_blogs_tags", "ON blogs USING GIN(tags)")
+    create_index(cursor, "idx_comments_blog_id", "ON comments(blog_id)")
+    create_index(cursor, "idx_comments_username", "ON comments(username)")
+    create_index(cursor, "idx_comments_created_at", "ON comments(created_at)")
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS follows(
@@ -54,12 +77,552 @@ def create_blog_tables(cursor):
         );
     """)
 
+    create_blog_tag_index(cursor)
+    create_daily_quota_table(cursor)
+    create_comment_function(cursor)
+    create_sentiment_stats(cursor)
+
+
+# Creates daily_quotas, one row per user per day counting the blogs and comments they posted that day
+# create_blog and add_comment bump the counter in the same statement as their INSERT, so the row lock on
+# (username, day) serializes concurrent posts by the same user and the limit can never be overshot
+def create_daily_quota_table(cursor):
+    # Checked before creating the table so today's existing posts are only backfilled once
+    cursor.execute("SELECT to_regclass('daily_quotas')")
+    needs_backfill = cursor.fetchone()[0] is None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_quotas(
+            username       VARCHAR(255) NOT NULL REFERENCES auth(username) ON DELETE CASCADE,
+            day            DATE NOT NULL,
+            blog_count     INTEGER NOT NULL DEFAULT 0,
+            comment_count  INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, day)
+        )
+    """)
+
+    if needs_backfill:
+        cursor.execute("""
+            INSERT INTO daily_quotas (username, day, blog_count, comment_count)
+            SELECT username, CURRENT_DATE, SUM(blog_count), SUM(comment_count)
+            FROM (
+                SELECT username, COUNT(*) AS blog_count, 0 AS comment_count
+                FROM blogs WHERE created_at >= CURRENT_DATE
+                GROUP BY username
+                UNION ALL
+                SELECT username, 0, COUNT(*)
+                FROM comments WHERE created_at >= CURRENT_DATE
+                GROUP BY username
+            ) today
+            GROUP BY username
+            ON CONFLICT DO NOTHING
+        """)
+
+
+# Creates add_comment_checked, which runs every add_comment rule and the INSERT server side in one round trip
+# It returns a status the blueprint maps to an HTTP code (see COMMENT_STATUS_ERRORS) plus the new comment's id and timestamp
+def create_comment_function(cursor):
+    # The one-comment-per-blog rule is enforced by the database, not just checked beforehand
+    create_index(cursor, "uq_comments_blog_id_username", "ON comments(blog_id, username)", unique=True)
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION add_comment_checked(
+            p_blog_id      BIGINT,
+            p_username     VARCHAR,
+            p_sentiment    VARCHAR,
+            p_description  TEXT,
+            p_daily_limit  INTEGER
+        ) RETURNS TABLE(result_status TEXT, new_comment_id BIGINT, new_created_at TIMESTAMPTZ) AS $$
+        DECLARE
+            v_author  VARCHAR;
+            v_claimed INTEGER;
+        BEGIN
+            SELECT b.username INTO v_author FROM blogs b WHERE b.blog_id = p_blog_id;
+            IF NOT FOUND THEN
+                RETURN QUERY SELECT 'not_found', NULL::BIGINT, NULL::TIMESTAMPTZ;
+                RETURN;
+            END IF;
+
+            IF v_author = p_username THEN
+                RETURN QUERY SELECT 'own_blog', NULL::BIGINT, NULL::TIMESTAMPTZ;
+                RETURN;
+            END IF;
+
+            -- The quota claim and the INSERT share a block so a duplicate comment also gives the slot back
+            BEGIN
+                INSERT INTO daily_quotas AS q (username, day, comment_count)
+                VALUES (p_username, CURRENT_DATE, 1)
+                ON CONFLICT (username, day) DO UPDATE
+                    SET comment_count = q.comment_count + 1
+                    WHERE q.comment_count < p_daily_limit
+                RETURNING 1 INTO v_claimed;
+
+                IF v_claimed IS NULL THEN
+                    RETURN QUERY SELECT 'limit', NULL::BIGINT, NULL::TIMESTAMPTZ;
+                    RETURN;
+                END IF;
+
+                RETURN QUERY
+                INSERT INTO comments AS c (blog_id, username, sentiment, description)
+                VALUES (p_blog_id, p_username, p_sentiment, p_description)
+                RETURNING 'ok'::TEXT, c.comment_id, c.created_at;
+            EXCEPTION WHEN unique_violation THEN
+                RETURN QUERY SELECT 'duplicate', NULL::BIGINT, NULL::TIMESTAMPTZ;
+            END;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+
+# Creates blog_sentiment_stats and user_comment_stats, running totals of Positive/Negative comments kept up to date by triggers
+# Queries 5, 6 and 7 read these instead of re-aggregating comments on every request
+#   blog_sentiment_stats -> per blog, how many Positive and Negative comments it received
+#   user_comment_stats   -> per user, the comments they gave and the blogs/Negative comments their blogs received
+def create_sentiment_stats(cursor):
+    # Checked before creating the tables so existing comments are only counted once
+    cursor.execute("SELECT to_regclass('blog_sentiment_stats')")
+    needs_backfill = cursor.fetchone()[0] is None
+
+    # No foreign key to blogs on purpose, the blogs delete trigger removes the row itself after cascaded comment deletes ran
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blog_sentiment_stats(
+            blog_id         BIGINT PRIMARY KEY,
+            username        VARCHAR(255) NOT NULL,
+            positive_count  INTEGER NOT NULL DEFAULT 0,
+            negative_count  INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_comment_stats(
+            username           VARCHAR(255) PRIMARY KEY REFERENCES auth(username) ON DELETE CASCADE,
+            positive_given     INTEGER NOT NULL DEFAULT 0,
+            negative_given     INTEGER NOT NULL DEFAULT 0,
+            blog_count         INTEGER NOT NULL DEFAULT 0,
+            negative_received  INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Partial indexes hold exactly the rows each query returns
+    create_index(cursor, "idx_blog_sentiment_all_positive",
+                 "ON blog_sentiment_stats(username) WHERE positive_count > 0 AND negative_count = 0")
+    create_index(cursor, "idx_user_stats_only_negative",
+                 "ON user_comment_stats(username) WHERE negative_given > 0 AND positive_given = 0")
+    create_index(cursor, "idx_user_stats_no_negative_received",
+                 "ON user_comment_stats(username) WHERE blog_count > 0 AND negative_received = 0")
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION track_blog_sentiment() RETURNS trigger AS $$
+        DECLARE
+            v_negative INTEGER;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO blog_sentiment_stats (blog_id, username) VALUES (NEW.blog_id, NEW.username);
+
+                INSERT INTO user_comment_stats AS s (username, blog_count) VALUES (NEW.username, 1)
+                ON CONFLICT (username) DO UPDATE SET blog_count = s.blog_count + 1;
+            ELSE
+                -- Fires after the cascaded comment deletes, so negative_count is whatever they left behind
+                DELETE FROM blog_sentiment_stats WHERE blog_id = OLD.blog_id
+                RETURNING negative_count INTO v_negative;
+
+                UPDATE user_comment_stats
+                SET blog_count = blog_count - 1,
+                    negative_received = negative_received - COALESCE(v_negative, 0)
+                WHERE username = OLD.username;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION track_comment_sentiment() RETURNS trigger AS $$
+        DECLARE
+            v_row     comments%ROWTYPE;
+            v_delta   INTEGER;
+            v_pos     INTEGER;
+            v_neg     INTEGER;
+            v_author  VARCHAR;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                v_row := NEW;
+                v_delta := 1;
+            ELSE
+                v_row := OLD;
+                v_delta := -1;
+            END IF;
+
+            v_pos := CASE WHEN v_row.sentiment = 'Positive' THEN v_delta ELSE 0 END;
+            v_neg := CASE WHEN v_row.sentiment = 'Negative' THEN v_delta ELSE 0 END;
+
+            UPDATE blog_sentiment_stats
+            SET positive_count = positive_count + v_pos,
+                negative_count = negative_count + v_neg
+            WHERE blog_id = v_row.blog_id
+            RETURNING username INTO v_author;
+
+            -- Both user rows this comment changes are locked in username order before either is written, so two
+            -- users commenting on each other's blogs at the same time queue up instead of deadlocking
+            PERFORM 1 FROM user_comment_stats
+            WHERE username IN (v_row.username, v_author)
+            ORDER BY username
+            FOR UPDATE;
+
+            -- Deletes only UPDATE, an upsert could recreate the row of a user whose auth row is being deleted
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO user_comment_stats AS s (username, positive_given, negative_given)
+                VALUES (v_row.username, v_pos, v_neg)
+                ON CONFLICT (username) DO UPDATE
+                    SET positive_given = s.positive_given + v_pos,
+                        negative_given = s.negative_given + v_neg;
+            ELSE
+                UPDATE user_comment_stats
+                SET positive_given = positive_given + v_pos,
+                    negative_given = negative_given + v_neg
+                WHERE username = v_row.username;
+            END IF;
+
+            IF v_neg <> 0 AND v_author IS NOT NULL THEN
+                UPDATE user_comment_stats
+                SET negative_received = negative_received + v_neg
+                WHERE username = v_author;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Postgres fires same-event triggers in name order, the RI_ cascade triggers sort before these trg_ ones
+    cursor.execute("""
+        CREATE OR REPLACE TRIGGER trg_blogs_sentiment_stats
+        AFTER INSERT OR DELETE ON blogs
+        FOR EACH ROW EXECUTE FUNCTION track_blog_sentiment();
+
+        CREATE OR REPLACE TRIGGER trg_comments_sentiment_stats
+        AFTER INSERT OR DELETE ON comments
+        FOR EACH ROW EXECUTE FUNCTION track_comment_sentiment();
+    """)
+
+    if needs_backfill:
+        rebuild_sentiment_stats(cursor)
+
+
+# Recomputes both stats tables from blogs and comments
+# Called once when the tables are created, can also be run by hand if the counters are ever suspected to have drifted
+def rebuild_sentiment_stats(cursor):
+    cursor.execute("""
+        TRUNCATE blog_sentiment_stats, user_comment_stats;
+
+        INSERT INTO blog_sentiment_stats (blog_id, username, positive_count, negative_count)
+        SELECT
+            b.blog_id,
+            b.username,
+            COUNT(c.comment_id) FILTER (WHERE c.sentiment = 'Positive'),
+            COUNT(c.comment_id) FILTER (WHERE c.sentiment = 'Negative')
+        FROM blogs b
+        LEFT JOIN comments c ON c.blog_id = b.blog_id
+        GROUP BY b.blog_id;
+
+        INSERT INTO user_comment_stats (username, positive_given, negative_given, blog_count, negative_received)
+        SELECT
+            a.username,
+            COALESCE(g.positive_given, 0),
+            COALESCE(g.negative_given, 0),
+            COALESCE(r.blog_count, 0),
+            COALESCE(r.negative_received, 0)
+        FROM auth a
+        LEFT JOIN (
+            SELECT
+                username,
+                COUNT(*) FILTER (WHERE sentiment = 'Positive') AS positive_given,
+                COUNT(*) FILTER (WHERE sentiment = 'Negative') AS negative_given
+            FROM comments
+            GROUP BY username
+        ) g ON g.username = a.username
+        LEFT JOIN (
+            SELECT
+                username,
+                COUNT(*) AS blog_count,
+                SUM(negative_count) AS negative_received
+            FROM blog_sentiment_stats
+            GROUP BY username
+        ) r ON r.username = a.username
+        WHERE g.username IS NOT NULL OR r.username IS NOT NULL;
+    """)
+
+
+# Creates blog_tags, a normalized copy of every blog's tags lower-cased, one row per (blog, tag)
+# The tags array on blogs stays the source of truth, a trigger keeps blog_tags in sync on every insert/update
+# blog_tags is what /search reads, since LOWER(t) LIKE '%tag%' over unnest(tags) can't use any index on blogs
+def create_blog_tag_index(cursor):
+    # pg_trgm provides the trigram operator class that lets LIKE '%tag%' use an index
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Checked before creating the table so existing blogs are only backfilled once, not on every start up
+    cursor.execute("SELECT to_regclass('blog_tags')")
+    needs_backfill = cursor.fetchone()[0] is None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blog_tags(
+            blog_id    BIGINT NOT NULL REFERENCES blogs(blog_id) ON DELETE CASCADE,
+            tag_lower  TEXT NOT NULL,
+            PRIMARY KEY (tag_lower, blog_id)
+        )
+    """)
+
+    # text_pattern_ops serves exact and prefix (LIKE 'tag%') lookups, gin_trgm_ops serves substring (LIKE '%tag%') lookups
+    create_index(cursor, "idx_blog_tags_prefix", "ON blog_tags(tag_lower text_pattern_ops)")
+    create_index(cursor, "idx_blog_tags_trgm", "ON blog_tags USING GIN(tag_lower gin_trgm_ops)")
+    create_index(cursor, "idx_blog_tags_blog_id", "ON blog_tags(blog_id)")
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION sync_blog_tags() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                DELETE FROM blog_tags WHERE blog_id = NEW.blog_id;
+            END IF;
+
+            INSERT INTO blog_tags (blog_id, tag_lower)
+            SELECT DISTINCT NEW.blog_id, LOWER(t)
+            FROM unnest(NEW.tags) AS t;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cursor.execute("""
+        CREATE OR REPLACE TRIGGER trg_blogs_sync_tags
+        AFTER INSERT OR UPDATE OF tags ON blogs
+        FOR EACH ROW EXECUTE FUNCTION sync_blog_tags();
+    """)
+
+    if needs_backfill:
+        cursor.execute("""
+            INSERT INTO blog_tags (blog_id, tag_lower)
+            SELECT DISTINCT b.blog_id, LOWER(t)
+            FROM blogs b, unnest(b.tags) AS t
+            ON CONFLICT DO NOTHING
+        """)
+
+
+# Creates user_day_tags, one row per (user, day, tag, blog) kept in sync with blogs by a trigger, for query1
+# query1 looks for a user who tagged different blogs on the same day with each requested tag; self-joining blogs on
+# username and DATE(created_at) can't use an index and grows with the square of each user's posts, here every
+# requested tag is one range scan of the primary key and the (username, day) groups holding all of them are intersected
+# Tags are kept as written, query1 matches them case-sensitively like the original tags = ANY query did
+def create_user_day_tags(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_day_tags(
+            username  VARCHAR(255) NOT NULL,
+            day       DATE NOT NULL,
+            tag       TEXT NOT NULL,
+            blog_id   BIGINT NOT NULL REFERENCES blogs(blog_id) ON DELETE CASCADE,
+            PRIMARY KEY (tag, username, day, blog_id)
+        )
+    """)
+
+    # The cascade from blogs deletes by blog_id
+    create_index(cursor, "idx_user_day_tags_blog_id", "ON user_day_tags(blog_id)")
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION sync_user_day_tags() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                DELETE FROM user_day_tags WHERE blog_id = NEW.blog_id;
+            END IF;
+
+            INSERT INTO user_day_tags (username, day, tag, blog_id)
+            SELECT DISTINCT NEW.username, DATE(NEW.created_at), t, NEW.blog_id
+            FROM unnest(NEW.tags) AS t
+            WHERE NEW.created_at IS NOT NULL;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cursor.execute("""
+        CREATE OR REPLACE TRIGGER trg_blogs_sync_user_day_tags
+        AFTER INSERT OR UPDATE OF tags, username, created_at ON blogs
+        FOR EACH ROW EXECUTE FUNCTION sync_user_day_tags();
+    """)
+
+    # Runs every time rather than only when the table is new, so a migration that failed after creating the table
+    # still fills it when re-run. Blogs written since the trigger went in are already there, ON CONFLICT skips them
+    cursor.execute("""
+        INSERT INTO user_day_tags (username, day, tag, blog_id)
+        SELECT DISTINCT b.username, DATE(b.created_at), t, b.blog_id
+        FROM blogs b, unnest(b.tags) AS t
+        WHERE b.created_at IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """)
+
+
+
+# An author with more followers than this when they post becomes a pull author (feed_pull_authors): their blogs are
+# no longer copied into every follower's timeline, /feed reads them from blogs instead
+# Baked into the blogs trigger, changing it takes a migration that runs create_feed_timelines again
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+
+# Serializes a blog's fan-out with follows of its author, pairs with hashtext(username) in pg_advisory_xact_lock
+FEED_LOCK_CLASS = 4402
+
+
+# Creates the home feed tables behind /feed (fan-out on write):
+#   timelines          one row per (follower, blog) of every followed author's blogs, written by create_blog's insert
+#                      through a statement-level trigger, so a feed page is one range scan of the follower's rows
+#   feed_pull_authors  authors past FEED_FANOUT_MAX_FOLLOWERS, kept for good once added, /feed merges their blogs
+#                      in at read time, so a post never costs more than FEED_FANOUT_MAX_FOLLOWERS inserts
+# Triggers on follows copy a newly followed author's blogs in and delete them on unfollow, bulk loads included
+def create_feed_timelines(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS timelines(
+            username    VARCHAR(255) NOT NULL REFERENCES auth(username) ON DELETE CASCADE,
+            created_at  TIMESTAMP WITH TIME ZONE NOT NULL,
+            blog_id     BIGINT NOT NULL REFERENCES blogs(blog_id) ON DELETE CASCADE,
+            author      VARCHAR(255) NOT NULL,
+            PRIMARY KEY (username, created_at, blog_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feed_pull_authors(
+            username  VARCHAR(255) PRIMARY KEY REFERENCES auth(username) ON DELETE CASCADE
+        )
+    """)
+
+    # Unfollow deletes by (follower, author), the cascade from blogs by blog_id
+    create_index(cursor, "idx_timelines_username_author", "ON timelines(username, author)")
+    create_index(cursor, "idx_timelines_blog_id", "ON timelines(blog_id)")
+    # A pull author's newest blogs for /feed, and a followed author's blogs for the follow trigger's copy
+    create_index(cursor, "idx_blogs_username_created_at", "ON blogs(username, created_at DESC, blog_id DESC)")
+
+    # Both triggers lock the authors involved first: without it a blog and a follow of its author committing at the
+    # same moment would each miss the other, leaving the blog out of the new follower's timeline
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION fan_out_blogs() RETURNS trigger AS $$
+        DECLARE
+            max_followers INTEGER := TG_ARGV[0]::integer;
+        BEGIN
+            PERFORM pg_advisory_xact_lock(%(lock_class)s, hashtext(username))
+            FROM (SELECT DISTINCT username FROM new_blogs ORDER BY username) authors;
+
+            INSERT INTO feed_pull_authors (username)
+            SELECT a.username
+            FROM (SELECT DISTINCT username FROM new_blogs) a
+            WHERE (
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM follows f WHERE f.followed_username = a.username LIMIT max_followers + 1
+                ) capped
+            ) > max_followers
+            ON CONFLICT DO NOTHING;
+
+            INSERT INTO timelines (username, created_at, blog_id, author)
+            SELECT f.follower_username, n.created_at, n.blog_id, n.username
+            FROM new_blogs n
+            JOIN follows f ON f.followed_username = n.username
+            WHERE n.created_at IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM feed_pull_authors p WHERE p.username = n.username)
+            ON CONFLICT DO NOTHING;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """, {"lock_class": FEED_LOCK_CLASS})
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION fan_out_follows() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(%(lock_class)s, hashtext(followed_username))
+            FROM (SELECT DISTINCT followed_username FROM changed_follows ORDER BY followed_username) authors;
+
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO timelines (username, created_at, blog_id, author)
+                SELECT c.follower_username, b.created_at, b.blog_id, b.username
+                FROM changed_follows c
+                JOIN blogs b ON b.username = c.followed_username
+                WHERE b.created_at IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM feed_pull_authors p WHERE p.username = c.followed_username)
+                ON CONFLICT DO NOTHING;
+            ELSE
+                DELETE FROM timelines t
+                USING changed_follows c
+                WHERE t.username = c.follower_username AND t.author = c.followed_username;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """, {"lock_class": FEED_LOCK_CLASS})
+
+    # Triggers and backfill go in one transaction, like the row counters, so no blog or follow slips in between
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("LOCK TABLE blogs, follows IN SHARE MODE")
+
+        cursor.execute("""
+            CREATE OR REPLACE TRIGGER trg_blogs_fan_out
+            AFTER INSERT ON blogs REFERENCING NEW TABLE AS new_blogs
+            FOR EACH STATEMENT EXECUTE FUNCTION fan_out_blogs(%(max_followers)s);
+
+            CREATE OR REPLACE TRIGGER trg_follows_fan_out_insert
+            AFTER INSERT ON follows REFERENCING NEW TABLE AS changed_follows
+            FOR EACH STATEMENT EXECUTE FUNCTION fan_out_follows();
+
+            CREATE OR REPLACE TRIGGER trg_follows_fan_out_delete
+            AFTER DELETE ON follows REFERENCING OLD TABLE AS changed_follows
+            FOR EACH STATEMENT EXECUTE FUNCTION fan_out_follows();
+        """, {"max_followers": FEED_FANOUT_MAX_FOLLOWERS})
+
+        # Runs every time rather than only when the tables are new, so re-running the migration after a failure still
+        # fills them. Both inserts are ON CONFLICT DO NOTHING and read only current follows, so a re-run adds nothing
+        # already there and brings back nothing that was unfollowed
+        cursor.execute("""
+            INSERT INTO feed_pull_authors (username)
+            SELECT followed_username
+            FROM follows
+            GROUP BY followed_username
+            HAVING COUNT(*) > %s
+            ON CONFLICT DO NOTHING
+        """, (FEED_FANOUT_MAX_FOLLOWERS,))
+
+        cursor.execute("""
+            INSERT INTO timelines (username, created_at, blog_id, author)
+            SELECT f.follower_username, b.created_at, b.blog_id, b.username
+            FROM follows f
+            JOIN blogs b ON b.username = f.followed_username
+            WHERE b.created_at IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM feed_pull_authors p WHERE p.username = f.followed_username)
+            ON CONFLICT DO NOTHING
+        """)
+
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
 
 
 
 
 #---------------------------------------------------------Helper Functions---------------------------------------------------------------#
 
+# Daily posting limits, enforced through the daily_quotas table
+DAILY_BLOG_LIMIT = 2
+DAILY_COMMENT_LIMIT = 3
+
+# Maps each non-ok status returned by add_comment_checked to the error sent to the frontend
+COMMENT_STATUS_ERRORS = {
+    "not_found": ("Blog not found", 404),
+    "own_blog": ("You cannot comment on your own blog", 403),
+    "duplicate": ("You can only comment once per blog", 409),
+    "limit": (f"You can only make {DAILY_COMMENT_LIMIT} comments per day", 429),
+}
+
+
 def validate_blog_data(subject, description, tags):
     """
     Validates blog creation data
@@ -83,6 +646,24 @@ def validate_blog_data(subject, description, tags):
     return errors
 
 
+def not_modified(etag):
+    """Returns a 304 for etag if the client's If-None-Match already holds it, otherwise None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = make_response("", 304)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def with_etag(response, etag):
+    # no-cache lets the browser keep the body but makes it revalidate with If-None-Match every time
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 def validate_comment_data(sentiment, description):
     """
     Validates comment data
@@ -103,59 +684,54 @@ def validate_comment_data(sentiment, description):
     return errors
 
 
-def check_daily_blog_limit(cursor, username):
-    """Checks if user has posted 2 blogs today"""
-    cursor.execute("""
-        SELECT COUNT(*) FROM blogs 
-        WHERE username = %s 
-        AND DATE(created_at) = CURRENT_DATE
-    """, (username,))
-    
-    count = cursor.fetchone()[0]
-    return count >= 2
-
-
-def check_daily_comment_limit(cursor, username):
-    """Checks if user has made 3 comments today"""
-    cursor.execute("""
-        SELECT COUNT(*) FROM comments 
-        WHERE username = %s 
-        AND DATE(created_at) = CURRENT_DATE
-    """, (username,))
-    
-    count = cursor.fetchone()[0]
-    return count >= 3
-
-
-def check_comment_exists(cursor, username, blog_id):
-    """Checks if user has already commented on this blog"""
-    # SELECT 1 is used instead of an actual result (ex: SELECT *) for the query since its faster for this purpose (just finding out if something is there)
-    cursor.execute("""
-        SELECT 1 FROM comments 
-        WHERE username = %s AND blog_id = %s
-    """, (username, blog_id))
-    
-    return cursor.fetchone() is not None
-
-
-def get_blog_author(cursor, blog_id):
-    """Gets the author username of a blog"""
-    cursor.execute("SELECT username FROM blogs WHERE blog_id = %s", (blog_id,))
-    result = cursor.fetchone()
-    return result[0] if result else None
-
-
-def check_if_blog_exists(cursor, blog_id):
-    """Checks if a blog exists"""
-    
-    cursor.execute("SELECT 1 FROM blogs WHERE blog_id = %s", (blog_id,))
-    return cursor.fetchone() is not None
+#-------------------------------------------Prepared Statements-----------------------------------------------------------------------------------#
+
+# The statements every search, blog view, post and comment runs, prepared once per pooled connection (see prepared.py)
+
+# Claims one of today's blog slots and inserts the blog in a single statement
+# The upsert only bumps the counter while it is under the limit, if it is already full the quota CTE
+# returns no row, nothing is inserted and the statement comes back empty
+CREATE_BLOG_SQL = """
+    WITH quota AS (
+        INSERT INTO daily_quotas (username, day, blog_count)
+        VALUES (%s, CURRENT_DATE, 1)
+        ON CONFLICT (username, day) DO UPDATE
+            SET blog_count = daily_quotas.blog_count + 1
+            WHERE daily_quotas.blog_count < %s
+        RETURNING 1
+    )
+    INSERT INTO blogs (username, subject, description, tags)
+    SELECT %s, %s, %s, %s FROM quota
+    RETURNING blog_id, created_at
+"""
+
+ADD_COMMENT_SQL = "SELECT * FROM add_comment_checked(%s, %s, %s, %s, %s)"
+
+CREATE_BLOG = prepared.register("create_blog", CREATE_BLOG_SQL, ("varchar", "integer", "varchar", "text", "text", "text[]"))
+ADD_COMMENT = prepared.register("add_comment", ADD_COMMENT_SQL, ("bigint", "varchar", "varchar", "text", "integer"))
+SEARCH_VERSION = prepared.register("search_version", SEARCH_VERSION_SQL)
+BLOG_VERSION = prepared.register("blog_version", BLOG_VERSION_SQL, ("bigint",))
+BLOG = prepared.register("blog", BLOG_SQL, ("bigint",))
+BLOG_COMMENTS = prepared.register("blog_comments", BLOG_COMMENTS_SQL, ("bigint",))
+FEED = prepared.register("feed", FEED_SQL, (
+    "varchar", "timestamptz", "timestamptz", "bigint", "bigint",
+    "timestamptz", "timestamptz", "bigint", "bigint", "varchar", "bigint",
+))
+
+# One statement per search mode since each has its own predicate
+# Prefix LIKE on a parameter can't use text_pattern_ops in a generic plan, so Postgres keeps choosing custom plans
+# for that one, it still skips parsing and analysis
+SEARCH = {
+    mode: prepared.register(f"search_{mode}", search_sql(mode), ("text", "timestamptz", "timestamptz", "bigint", "bigint"))
+    for mode in TAG_SEARCH_PREDICATES
+}
 
 
 #-------------------------------------------Create Blog-----------------------------------------------------------------------------------------#
 
 
 @blog_bp.route('/create', methods=['POST'])
+@writes
 def create_blog():
     conn = None
     
@@ -188,28 +764,23 @@ def create_blog():
         conn.autocommit = True
         cur = conn.cursor()
         
-        if check_daily_blog_limit(cur, username):
-            return jsonify({"error": "You can only post 2 blogs per day"}), 429
-        
-        # Tries to insert values into blogs table, outputs blog_id and created_at as a result of DDL
-        cur.execute("""
-            INSERT INTO blogs (username, subject, description, tags)
-            VALUES (%s, %s, %s, %s)
-            RETURNING blog_id, created_at
-        """, (username, subject.strip(), description.strip(), tags))
+        # Claims a daily slot and inserts the blog in one statement, see CREATE_BLOG_SQL
+        prepared.execute(cur, CREATE_BLOG, (username, DAILY_BLOG_LIMIT, username, subject.strip(), description.strip(), tags))
         
         result = cur.fetchone()
         
-        # If result has no value, return error and HTTP 500
+        # No row back means the quota CTE refused the slot
         if not result:
-            return jsonify({"error": "Failed to create blog"}), 500
+            return jsonify({"error": f"You can only post {DAILY_BLOG_LIMIT} blogs per day"}), 429
         
         blog_id, created_at = result
         
+        bump_version(cur, "blogs")
+        
         return jsonify({
             "message": "Blog created successfully",
             "blog_id": blog_id,
-            "created_at": created_at.isoformat()
+            "created_at": created_at
         }), 201
         
     finally:
@@ -220,138 +791,127 @@ def create_blog():
 #-----------------------------------------------------Search/View/Comment----------------------------------------------------------------------#
 
 @blog_bp.route('/search', methods=['GET', 'POST'])
+@read_only
 def search_blogs():
     conn = None
+    pool = request_pool()
     
     # Support both GET and POST
     if request.method == 'POST':
         data = request.get_json(force=True)
-        tag = data.get('tag', '').strip()
     else:
-        tag = request.args.get('tag', '').strip()
-    
-    if not tag:
-        return jsonify({"error": "Tag parameter is required"}), 400
-    
+        data = request.args
+
     try:
-        conn = db_pool.getconn()
+        search = parse_search_request(data)
+    except SearchRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = pool.getconn()
         conn.autocommit = True
         cur = conn.cursor()
+
+        # A page only changes when blogs are written to, so a client holding it gets a 304 after this one cheap query
+        # If-None-Match is only honoured on GET, a conditional POST must never be answered with a 304
+        etag = None
+        if request.method == 'GET':
+            prepared.execute(cur, SEARCH_VERSION)
+            etag = search_etag(search, cur.fetchone())
+            cached = not_modified(etag)
+            if cached:
+                return cached
         
-        # Search for blogs containing the tag (case-insensitive)
-        cur.execute("""
-            SELECT 
-                blog_id,
-                username,
-                subject,
-                description,
-                tags,
-                created_at
-            FROM blogs
-            WHERE %s = ANY(tags) OR EXISTS (
-                SELECT 1 FROM unnest(tags) AS t 
-                WHERE LOWER(t) LIKE LOWER(%s)
-            )
-            ORDER BY created_at DESC
-        """, (tag, f'%{tag}%'))
-        
+        # Search for blogs with a matching tag (case-insensitive), one page at a time
+        prepared.execute(cur, SEARCH[search["mode"]], search_params(search))
         results = cur.fetchall()
-        
-        blogs = []
-        for row in results:
-            blogs.append({
-                "blog_id": row[0],
-                "username": row[1],
-                "subject": row[2],
-                "description": row[3],
-                "tags": row[4],
-                "created_at": row[5].isoformat()
-            })
-        
-        return jsonify({
-            "tag": tag,
-            "count": len(blogs),
-            "blogs": blogs
-        }), 200
+
+        response = jsonify(search_response(search, results))
+        return (with_etag(response, etag) if etag else response), 200
         
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
+
+
+@blog_bp.route('/feed', methods=['GET'])
+@read_only
+def home_feed():
+    """Newest blogs from the users the logged in user follows, a page at a time (?limit=&cursor=)"""
+    username = session.get('username')
+    if not username:
+        return jsonify({"error": "Please log in first to see your feed"}), 401
+
+    try:
+        feed = parse_feed_request(request.args)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = None
+    pool = request_pool()
+    try:
+        conn = pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        # Timeline rows pushed by create_blog merged with the pull authors' newest blogs, see FEED_SQL
+        prepared.execute(cur, FEED, feed_params(username, feed))
+        rows = cur.fetchall()
+
+        return jsonify(feed_response(feed, rows)), 200
+
+    finally:
+        if conn:
+            pool.putconn(conn)
 
 
 @blog_bp.route('/<int:blog_id>', methods=['GET'])
+@read_only
 def get_blog(blog_id):
     conn = None
+    pool = request_pool()
     
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         conn.autocommit = True
         cur = conn.cursor()
         
-        if not check_if_blog_exists(cur, blog_id):
+        # Checks the blog exists and gets its version for the ETag in one lightweight query
+        prepared.execute(cur, BLOG_VERSION, (blog_id,))
+        version = cur.fetchone()
+
+        if not version:
             return jsonify({"error": "Blog not found"}), 404
+
+        etag = blog_etag(blog_id, version)
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
         # Fetches blog details
-        cur.execute("""
-            SELECT 
-                blog_id,
-                username,
-                subject,
-                description,
-                tags,
-                created_at
-            FROM blogs
-            WHERE blog_id = %s
-        """, (blog_id,))
-        
+        prepared.execute(cur, BLOG, (blog_id,))
         blog_row = cur.fetchone()
         
         if not blog_row:
             return jsonify({"error": "Blog not found"}), 404
         
         # Fetches comments for this blog
-        cur.execute("""
-            SELECT 
-                comment_id,
-                username,
-                sentiment,
-                description,
-                created_at
-            FROM comments
-            WHERE blog_id = %s
-            ORDER BY created_at DESC
-        """, (blog_id,))
-        
+        prepared.execute(cur, BLOG_COMMENTS, (blog_id,))
         comment_rows = cur.fetchall()
         
         # Format response
-        blog = {
-            "blog_id": blog_row[0],
-            "username": blog_row[1],
-            "subject": blog_row[2],
-            "description": blog_row[3],
-            "tags": blog_row[4],
-            "created_at": blog_row[5].isoformat(),
-            "comments": []
-        }
-        
-        for comment in comment_rows:
-            blog["comments"].append({
-                "comment_id": comment[0],
-                "username": comment[1],
-                "sentiment": comment[2],
-                "description": comment[3],
-                "created_at": comment[4].isoformat()
-            })
+        blog = blog_row_to_dict(blog_row)
+        blog["comments"] = [comment_row_to_dict(comment) for comment in comment_rows]
         
-        return jsonify(blog), 200
+        return with_etag(jsonify(blog), etag), 200
         
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
 
 
 @blog_bp.route('/<int:blog_id>/comment', methods=['POST'])
+@writes
 def add_comment(blog_id):
     conn = None
     
@@ -374,139 +934,128 @@ def add_comment(blog_id):
         conn.autocommit = True
         cur = conn.cursor()
         
-        # Check if blog exists and get author
-        blog_author = get_blog_author(cur, blog_id)
-        if not blog_author:
-            return jsonify({"error": "Blog not found"}), 404
-        
-        if blog_author == username:
-            return jsonify({"error": "You cannot comment on your own blog"}), 403
-        
-        if check_comment_exists(cur, username, blog_id):
-            return jsonify({"error": "You can only comment once per blog"}), 409
-        
-        if check_daily_comment_limit(cur, username):
-            return jsonify({"error": "You can only make 3 comments per day"}), 429
-        
-        # Tries to insert values into comments table, outputs comment_id and created_at as a result of DDL
-        cur.execute("""
-            INSERT INTO comments (blog_id, username, sentiment, description)
-            VALUES (%s, %s, %s, %s)
-            RETURNING comment_id, created_at
-        """, (blog_id, username, sentiment.strip(), description.strip()))
+        # Every rule (blog exists, not own blog, one comment per blog, daily limit) and the INSERT run in one call
+        prepared.execute(
+            cur, ADD_COMMENT,
+            (blog_id, username, sentiment.strip(), description.strip(), DAILY_COMMENT_LIMIT),
+        )
         
-        result = cur.fetchone()
+        status, comment_id, created_at = cur.fetchone()
         
-        # If result has no value, return error and HTTP 500
-        if not result:
-            return jsonify({"error": "Failed to create comment"}), 500
+        if status in COMMENT_STATUS_ERRORS:
+            message, code = COMMENT_STATUS_ERRORS[status]
+            return jsonify({"error": message}), code
         
-        comment_id, created_at = result
+        bump_version(cur, "comments")
         
         return jsonify({
             "message": "Comment added successfully",
             "comment_id": comment_id,
-            "created_at": created_at.isoformat()
+            "created_at": created_at
         }), 201
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
+    except pg.Error as e:
+        print(f"Database error while adding comment: {e}")
+        return jsonify({"error": "Database error"}), 500
         
     finally:
         if conn:
             db_pool.putconn(conn)
 
 
+@blog_bp.route('/_debug/counters', methods=['GET'])
+@read_only
+def _debug_counters():
+    # Users, blogs and comments in total and today, for the health dashboards
+    # ?mode=exact (default) reads the trigger maintained counters, ?mode=estimate the planner's statistics
+    mode = request.args.get("mode", "exact").lower()
+    if mode not in COUNTER_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(COUNTER_MODES)}"}), 400
+
+    return jsonify(read_counters(request_pool(), mode)), 200
+
+
 @blog_bp.route('/_debug/stats', methods=['GET'])
+@read_only
 def _debug_stats():
-    conn = None
-    
-    try:
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cur = conn.cursor()
-        
-        # Fetches number of blogs and comments, for admin use
-        cur.execute("SELECT COUNT(*) FROM blogs")
-        total_blogs = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM comments")
-        total_comments = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM blogs WHERE DATE(created_at) = CURRENT_DATE")
-        blogs_today = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM comments WHERE DATE(created_at) = CURRENT_DATE")
-        comments_today = cur.fetchone()[0]
-        
-        return jsonify({
-            "total_blogs": total_blogs,
-            "total_comments": total_comments,
-            "blogs_today": blogs_today,
-            "comments_today": comments_today
-        }), 200
-        
-    finally:
-        if conn:
-            db_pool.putconn(conn)
+    # Fetches number of blogs and comments, for admin use, see _debug_counters
+    counters = read_counters(request_pool())
+
+    return jsonify({
+        "total_blogs": counters["blogs"],
+        "total_comments": counters["comments"],
+        "blogs_today": counters["blogs_today"],
+        "comments_today": counters["comments_today"]
+    }), 200
+
+
+@blog_bp.route('/_debug/cache', methods=['GET'])
+def _debug_cache():
+    # Hit/miss counts of this worker's result cache, for monitoring
+    return jsonify(result_cache.stats()), 200
+
+
+@blog_bp.route('/_debug/pool', methods=['GET'])
+def _debug_pool():
+    # Connection pool usage of this worker: checked out, waiting, wait time histogram, acquisition rate and timeouts
+    return jsonify({
+        "primary": db_pool.stats(),
+        "replica": read_pool.stats() if read_pool else None,
+    }), 200
 
 #-----------------------------------------------------Phase 3----------------------------------------------------------------------#
 
+# The SQL for each query lives in queries.py, shared with the async app (async_blog.py) and benchmarks/phase3.py
+
 @blog_bp.route("/query1", methods=["POST"])
+@read_only
 def query1_same_day_tags():
     """
     Phase 3 - Query 1:
     List users who posted at least two different blogs on the same day,
     one with tagA and one with tagB.
+    Also takes "tags": [...] for more than two tags, each one on a different blog from the same day.
     """
     data = request.get_json(silent=True) or {}
 
-    tag_a = data.get("tagA")
-    tag_b = data.get("tagB")
-
     # Basic validation
-    if not tag_a or not tag_b:
-        return jsonify({"error": "Both tagA and tagB are required"}), 400
+    try:
+        tags = parse_query1_tags(data)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
 
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            SELECT DISTINCT a.username, a.firstname, a.lastname
-            FROM blogs b1
-            JOIN blogs b2
-              ON b1.username = b2.username
-             AND b1.blog_id <> b2.blog_id
-             AND DATE(b1.created_at) = DATE(b2.created_at)
-            JOIN auth a
-              ON a.username = b1.username
-            WHERE %s = ANY (b1.tags)
-              AND %s = ANY (b2.tags);
-        """
-
-        cur.execute(sql, (tag_a, tag_b))
+        cur.execute(QUERY1_SQL, query1_params(tags))
         rows = cur.fetchall()
 
-        users = [
-            {
-                "username": row[0],
-                "firstname": row[1],
-                "lastname": row[2],
-            }
-            for row in rows
-        ]
+        users = query1_users(tags, rows)
 
         return jsonify({"users": users}), 200
 
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
     except Exception as e:
         print("[QUERY1] Error:", e)
         return jsonify({"error": "Internal server error"}), 500
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
 
 
 @blog_bp.route("/query2", methods=["GET"])
+@read_only
 def query2_most_blogs_on_date():
     """
     Phase 3 - Query 2:
@@ -515,44 +1064,29 @@ def query2_most_blogs_on_date():
 
     Date can be provided as a query parameter ?date=YYYY-MM-DD.
     If not provided, a default hard-coded date is used.
-    """
-    # Default date
-    default_date = "2025-10-10"
 
+    Range mode: ?start=YYYY-MM-DD&end=YYYY-MM-DD&top=K returns the top K users of every day in the range
+    (ties included) from one query.
+    """
     # Optional override from UI: /api/blog/query2?date=2025-11-09
-    target_date = request.args.get("date", default_date)
+    target_date = request.args.get("date", QUERY2_DEFAULT_DATE)
+
+    try:
+        date_range = parse_query2_range(request.args)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
 
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            WITH counts AS (
-                SELECT 
-                    username,
-                    COUNT(*) AS blog_count
-                FROM blogs
-                WHERE DATE(created_at) = %s
-                GROUP BY username
-            ),
-            max_count AS (
-                SELECT MAX(blog_count) AS max_blog_count
-                FROM counts
-            )
-            SELECT 
-                a.username,
-                a.firstname,
-                a.lastname,
-                c.blog_count
-            FROM counts c
-            JOIN max_count m
-              ON c.blog_count = m.max_blog_count
-            JOIN auth a
-              ON a.username = c.username;
-        """
-
-        cur.execute(sql, (target_date,))
+        if date_range:
+            cur.execute(QUERY2_RANGE_SQL, query2_range_params(date_range))
+            return jsonify(query2_range_response(date_range, cur.fetchall())), 200
+
+        cur.execute(QUERY2_SQL, query2_params(target_date))
         rows = cur.fetchall()
 
         users = [
@@ -568,69 +1102,62 @@ def query2_most_blogs_on_date():
 
         return jsonify({"users": users, "date": target_date}), 200
 
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
     except Exception as e:
         print("[QUERY2] Error:", e)
         return jsonify({"error": "Internal server error"}), 500
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
 
 
 @blog_bp.route("/query3", methods=["POST"])
+@read_only
 def query3_followed_by_both():
     """
     Phase 3 - Query 3:
     List the users who are followed by both users X and Y.
-    X and Y are provided in the request body.
+    X and Y are provided in the request body, or any number of users as "users": [...]
     """
     data = request.get_json(silent=True) or {}
 
-    user_x = data.get("userX")
-    user_y = data.get("userY")
+    if "users" in data:
+        try:
+            usernames = parse_common_followee_users(data["users"])
+        except QueryRequestError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        user_x = data.get("userX")
+        user_y = data.get("userY")
+
+        if not user_x or not user_y:
+            return jsonify({"error": "Both userX and userY are required"}), 400
 
-    if not user_x or not user_y:
-        return jsonify({"error": "Both userX and userY are required"}), 400
+        if user_x == user_y:
+            return jsonify({"error": "userX and userY must be different users"}), 400
 
-    if user_x == user_y:
-        return jsonify({"error": "userX and userY must be different users"}), 400
+        usernames = [user_x, user_y]
 
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            WITH common_followed AS (
-                SELECT 
-                    followed_username
-                FROM follows
-                WHERE follower_username IN (%s, %s)
-                GROUP BY followed_username
-                HAVING COUNT(DISTINCT follower_username) = 2
-            )
-            SELECT 
-                a.username,
-                a.firstname,
-                a.lastname
-            FROM common_followed cf
-            JOIN auth a
-              ON a.username = cf.followed_username;
-        """
-
-        cur.execute(sql, (user_x, user_y))
-        rows = cur.fetchall()
+        # Served from the follow graph cache when FOLLOW_GRAPH_CACHE_SIZE is set, see follow_graph.py
+        rows = common_followee_rows(cur, usernames)
 
-        users = [
-            {
-                "username": row[0],
-                "firstname": row[1],
-                "lastname": row[2],
-            }
-            for row in rows
-        ]
+        users = [user_row_to_dict(row) for row in rows]
 
-        return jsonify({"users": users, "userX": user_x, "userY": user_y}), 200
+        return jsonify({"users": users, "userX": usernames[0], "userY": usernames[1], "usernames": usernames}), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
 
     except Exception as e:
         print("[QUERY3] Error:", e)
@@ -638,43 +1165,44 @@ def query3_followed_by_both():
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
+
 
 @blog_bp.route("/query4", methods=["GET"])
+@read_only
 def query4_users_never_posted():
     """
     Phase 3 - Query 4:
     Display all the users who never posted a blog.
     """
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            SELECT 
-                a.username,
-                a.firstname,
-                a.lastname
-            FROM auth a
-            LEFT JOIN blogs b
-              ON b.username = a.username
-            WHERE b.blog_id IS NULL;
-        """
-
-        cur.execute(sql)
+        # Versions are read on the connection the query runs on, before it, so a write that lands mid-query
+        # invalidates this result (see cache.py)
+        versions = table_versions(cur, QUERY4_TABLES)
+
+        # Served from the result cache until a user/blog/comment write invalidates it
+        cached = result_cache.get("query4", versions)
+        if cached is not None:
+            return jsonify(cached), 200
+
+        cur.execute(QUERY4_SQL)
         rows = cur.fetchall()
 
-        users = [
-            {
-                "username": row[0],
-                "firstname": row[1],
-                "lastname": row[2],
-            }
-            for row in rows
-        ]
+        users = [user_row_to_dict(row) for row in rows]
 
-        return jsonify({"users": users}), 200
+        payload = {"users": users}
+        result_cache.put("query4", versions, payload)
+
+        return jsonify(payload), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
 
     except Exception as e:
         print("[QUERY4] Error:", e)
@@ -682,9 +1210,11 @@ def query4_users_never_posted():
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
+
 
 @blog_bp.route("/query5", methods=["POST"])
+@read_only
 def query5_user_blogs_all_positive():
     """
     Phase 3 - Query 5:
@@ -701,61 +1231,33 @@ def query5_user_blogs_all_positive():
         return jsonify({"error": "username is required"}), 400
 
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            SELECT 
-                b.blog_id,
-                b.username,
-                b.subject,
-                b.description,
-                b.tags,
-                b.created_at
-            FROM blogs b
-            WHERE b.username = %s
-              -- must have at least one comment
-              AND EXISTS (
-                  SELECT 1
-                  FROM comments c
-                  WHERE c.blog_id = b.blog_id
-              )
-              -- must NOT have any negative comments
-              AND NOT EXISTS (
-                  SELECT 1
-                  FROM comments c2
-                  WHERE c2.blog_id = b.blog_id
-                    AND c2.sentiment = 'Negative'
-              );
-        """
-
-        cur.execute(sql, (username,))
+        cur.execute(QUERY5_SQL, (username,))
         rows = cur.fetchall()
 
-        blogs = [
-            {
-                "blog_id": row[0],
-                "username": row[1],
-                "subject": row[2],
-                "description": row[3],
-                "tags": row[4],
-                "created_at": row[5].isoformat(),
-            }
-            for row in rows
-        ]
+        blogs = [blog_row_to_dict(row) for row in rows]
 
         return jsonify({"username": username, "blogs": blogs}), 200
 
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
     except Exception as e:
         print("[QUERY5] Error:", e)
         return jsonify({"error": "Internal server error"}), 500
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
+
 
 @blog_bp.route("/query6", methods=["GET"])
+@read_only
 def query6_users_only_negative_comments():
     """
     Phase 3 - Query 6:
@@ -763,42 +1265,33 @@ def query6_users_only_negative_comments():
     but each of them is Negative.
     """
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            WITH negative_only AS (
-                SELECT 
-                    c.username
-                FROM comments c
-                GROUP BY c.username
-                HAVING 
-                    COUNT(*) > 0
-                    AND SUM(CASE WHEN c.sentiment = 'Positive' THEN 1 ELSE 0 END) = 0
-            )
-            SELECT 
-                a.username,
-                a.firstname,
-                a.lastname
-            FROM negative_only n
-            JOIN auth a
-              ON a.username = n.username;
-        """
-
-        cur.execute(sql)
+        # Versions are read on the connection the query runs on, before it, so a write that lands mid-query
+        # invalidates this result (see cache.py)
+        versions = table_versions(cur, QUERY6_TABLES)
+
+        # Served from the result cache until a user/blog/comment write invalidates it
+        cached = result_cache.get("query6", versions)
+        if cached is not None:
+            return jsonify(cached), 200
+
+        cur.execute(QUERY6_SQL)
         rows = cur.fetchall()
 
-        users = [
-            {
-                "username": row[0],
-                "firstname": row[1],
-                "lastname": row[2],
-            }
-            for row in rows
-        ]
+        users = [user_row_to_dict(row) for row in rows]
 
-        return jsonify({"users": users}), 200
+        payload = {"users": users}
+        result_cache.put("query6", versions, payload)
+
+        return jsonify(payload), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
 
     except Exception as e:
         print("[QUERY6] Error:", e)
@@ -806,9 +1299,11 @@ def query6_users_only_negative_comments():
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
+
 
 @blog_bp.route("/query7", methods=["GET"])
+@read_only
 def query7_users_no_negative_on_blogs():
     """
     Phase 3 - Query 7:
@@ -817,50 +1312,33 @@ def query7_users_no_negative_on_blogs():
     Blogs may have only Positive comments or no comments at all.
     """
     conn = None
+    pool = request_pool()
     try:
-        conn = db_pool.getconn()
+        conn = pool.getconn()
         cur = conn.cursor()
 
-        sql = """
-            WITH user_blogs AS (
-                SELECT 
-                    b.username,
-                    COUNT(DISTINCT b.blog_id) AS blog_count,
-                    SUM(
-                        CASE 
-                            WHEN c.sentiment = 'Negative' THEN 1 
-                            ELSE 0 
-                        END
-                    ) AS neg_count
-                FROM blogs b
-                LEFT JOIN comments c
-                  ON c.blog_id = b.blog_id
-                GROUP BY b.username
-            )
-            SELECT 
-                a.username,
-                a.firstname,
-                a.lastname
-            FROM user_blogs ub
-            JOIN auth a
-              ON a.username = ub.username
-            WHERE ub.blog_count > 0
-              AND ub.neg_count = 0;
-        """
-
-        cur.execute(sql)
+        # Versions are read on the connection the query runs on, before it, so a write that lands mid-query
+        # invalidates this result (see cache.py)
+        versions = table_versions(cur, QUERY7_TABLES)
+
+        # Served from the result cache until a user/blog/comment write invalidates it
+        cached = result_cache.get("query7", versions)
+        if cached is not None:
+            return jsonify(cached), 200
+
+        cur.execute(QUERY7_SQL)
         rows = cur.fetchall()
 
-        users = [
-            {
-                "username": row[0],
-                "firstname": row[1],
-                "lastname": row[2],
-            }
-            for row in rows
-        ]
+        users = [user_row_to_dict(row) for row in rows]
 
-        return jsonify({"users": users}), 200
+        payload = {"users": users}
+        result_cache.put("query7", versions, payload)
+
+        return jsonify(payload), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
 
     except Exception as e:
         print("[QUERY7] Error:", e)
@@ -868,6 +1346,6 @@ def query7_users_no_negative_on_blogs():
 
     finally:
         if conn:
-            db_pool.putconn(conn)
+            pool.putconn(conn)
 
 
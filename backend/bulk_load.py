@@ -0,0 +1,275 @@
+#---------------------Libraries and packages here---------------------------#
+
+from db_conn import db_pool
+from cache import bump_version
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+#----------------------------------------------------------------------------#
+
+
+# Bulk loads users, blogs, comments and follows with COPY FROM STDIN instead of one INSERT per HTTP request
+# Used by the /api/admin/bulk-load endpoint (admin.py) and from the command line:
+#   cd backend
+#   python bulk_load.py auth users.csv
+#   python bulk_load.py blogs blogs.ndjson --format ndjson --batch-size 100000 --drop-indexes
+#
+# Input is CSV with a header row, or NDJSON (one JSON object per line). The header / object keys pick the columns.
+# Load order matters because of foreign keys: auth, then blogs, then comments and follows.
+# auth.password must already be a werkzeug hash, hashing here would cap throughput at a few hundred rows per second.
+# Triggers on the target table (ex: blog_tags sync on blogs) still fire for every copied row.
+
+
+# Columns each table accepts, anything else in the input is rejected before loading starts
+TABLE_COLUMNS = {
+    "auth": ["username", "password", "firstname", "lastname", "email", "phone"],
+    "blogs": ["blog_id", "username", "subject", "description", "tags", "created_at"],
+    "comments": ["comment_id", "blog_id", "username", "sentiment", "description", "created_at"],
+    "follows": ["follower_username", "followed_username", "created_at"],
+}
+
+# Serial id column per table, its sequence is moved past the loaded ids when rows come with explicit ids
+SERIAL_COLUMNS = {
+    "blogs": "blog_id",
+    "comments": "comment_id",
+}
+
+DEFAULT_BATCH_SIZE = 50_000
+
+
+class BulkLoadError(Exception):
+    """Raised for input that can't be loaded (unknown table, unknown columns, bad format)"""
+
+
+def to_pg_array(values):
+    """Formats a list as a Postgres array literal, ex: ['a', 'b c'] -> {"a","b c"}"""
+    items = []
+    for value in values:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        items.append(f'"{escaped}"')
+    return "{" + ",".join(items) + "}"
+
+
+def read_rows(stream, fmt):
+    """
+    Yields (columns, row) pairs from a text stream
+    columns is the same list object for every row, taken from the CSV header or the first NDJSON object
+    """
+    if fmt == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [c.strip().lower() for c in header]
+        for row in reader:
+            if row:
+                yield columns, row
+
+    elif fmt == "ndjson":
+        columns = None
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            if columns is None:
+                columns = [c.lower() for c in obj]
+            # Lists (blogs.tags) become array literals, missing keys become NULL
+            lowered = {k.lower(): v for k, v in obj.items()}
+            row = []
+            for column in columns:
+                value = lowered.get(column)
+                if isinstance(value, list):
+                    value = to_pg_array(value)
+                row.append(value)
+            yield columns, row
+
+    else:
+        raise BulkLoadError(f"Unknown format '{fmt}', expected csv or ndjson")
+
+
+def drop_secondary_indexes(cursor, table):
+    """
+    Drops the table's indexes that enforce nothing and returns their definitions so they can be rebuilt
+    Primary keys, UNIQUE indexes (whether or not a constraint owns them) and indexes behind any other constraint
+    are left alone so integrity is still enforced during the load
+    """
+    cursor.execute("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s)
+          AND NOT i.indisprimary
+          AND NOT i.indisunique
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = i.indexrelid
+          )
+    """, (table,))
+    indexes = cursor.fetchall()
+
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return indexes
+
+
+def copy_batch(cursor, table, columns, rows):
+    """Streams one batch of rows into table with COPY FROM STDIN"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        # None is written as an unquoted empty field, which COPY's csv format reads as NULL
+        writer.writerow(["" if v is None else v for v in row])
+    buf.seek(0)
+
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def bulk_load(stream, table, fmt="csv", batch_size=DEFAULT_BATCH_SIZE, drop_indexes=False, progress=None):
+    """
+    Loads every row of a CSV/NDJSON text stream into table, see load_rows
+    """
+    return load_rows(read_rows(stream, fmt), table, batch_size, drop_indexes, progress)
+
+
+def load_rows(rows, table, batch_size=DEFAULT_BATCH_SIZE, drop_indexes=False, progress=None, conn=None):
+    """
+    Loads every (columns, row) pair yielded by rows into table, committing every batch_size rows
+    progress, if given, is called with (rows_loaded, elapsed_seconds) after each batch
+    conn, if given, is used instead of a pooled connection and stays owned by the caller
+    Returns a summary dict with the row count and throughput
+    """
+    if table not in TABLE_COLUMNS:
+        raise BulkLoadError(f"Unknown table '{table}', expected one of: {', '.join(TABLE_COLUMNS)}")
+
+    owns_conn = conn is None
+    start = time.monotonic()
+    loaded = 0
+    dropped = []
+
+    try:
+        if owns_conn:
+            conn = db_pool.getconn()
+        conn.autocommit = False
+        cur = conn.cursor()
+
+        if drop_indexes:
+            dropped = drop_secondary_indexes(cur, table)
+            conn.commit()
+
+        columns = None
+        batch = []
+        for row_columns, row in rows:
+            if columns is None:
+                columns = row_columns
+                unknown = [c for c in columns if c not in TABLE_COLUMNS[table]]
+                if unknown:
+                    raise BulkLoadError(f"Unknown columns for {table}: {', '.join(unknown)}")
+
+            batch.append(row)
+            if len(batch) >= batch_size:
+                copy_batch(cur, table, columns, batch)
+                # Committed with the batch, so cached results computed before it are invalidated exactly when it lands
+                bump_version(cur, table)
+                conn.commit()
+                loaded += len(batch)
+                batch = []
+                if progress:
+                    progress(loaded, time.monotonic() - start)
+
+        if batch:
+            copy_batch(cur, table, columns, batch)
+            bump_version(cur, table)
+            conn.commit()
+            loaded += len(batch)
+            if progress:
+                progress(loaded, time.monotonic() - start)
+
+        # Rows loaded with explicit ids would otherwise collide with the next id handed out by INSERT
+        serial = SERIAL_COLUMNS.get(table)
+        if serial and columns and serial in columns:
+            cur.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', '{serial}'), COALESCE(MAX({serial}), 1))
+                FROM {table}
+            """)
+            conn.commit()
+
+        if loaded:
+            cur.execute(f"ANALYZE {table}")
+            conn.commit()
+
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+
+    finally:
+        # Indexes are rebuilt even when the load failed part way, committed batches are already in the table
+        if conn and dropped:
+            try:
+                cur = conn.cursor()
+                for _, indexdef in dropped:
+                    cur.execute(indexdef)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"[BULK] Error rebuilding indexes on {table}: {e}")
+        if conn:
+            conn.autocommit = True
+        if conn and owns_conn:
+            db_pool.putconn(conn)
+
+    elapsed = time.monotonic() - start
+    return {
+        "table": table,
+        "rows": loaded,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": int(loaded / elapsed) if elapsed > 0 else loaded,
+        "rebuilt_indexes": [name for name, _ in dropped],
+    }
+
+
+def print_progress(table):
+    def report(rows, elapsed):
+        rate = int(rows / elapsed) if elapsed > 0 else rows
+        print(f"[BULK] {table}: {rows} rows loaded ({rate} rows/s)", file=sys.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load CSV/NDJSON into auth, blogs, comments or follows")
+    parser.add_argument("table", choices=list(TABLE_COLUMNS))
+    parser.add_argument("path", help="Input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                        help="Defaults to ndjson for .ndjson/.jsonl files, csv otherwise")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--drop-indexes", action="store_true",
+                        help="Drop secondary indexes during the load and rebuild them afterwards")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv"
+
+    if args.path == "-":
+        stream = sys.stdin
+    else:
+        stream = open(args.path, newline="", encoding="utf-8")
+
+    try:
+        summary = bulk_load(stream, args.table, fmt, args.batch_size, args.drop_indexes, print_progress(args.table))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#---------------------Libraries and packages here---------------------------#
+
+from collections import OrderedDict
+import os
+import threading
+import time
+#----------------------------------------------------------------------------#
+
+
+# In-process result cache for endpoints whose answer only changes when certain tables are written to
+#
+# Every table has a version counter in the table_versions table, shared by every worker process and both apps:
+#   - the app's write paths bump it with bump_version right after their write committed (register -> auth,
+#     create_blog -> blogs, add_comment -> comments, follow/unfollow -> follows). A separate autocommit statement,
+#     so the row is only locked for that one UPDATE, never for a whole write. bulk_load.py bumps in every batch
+#   - statement-level triggers bump it on UPDATE, DELETE and TRUNCATE (cascaded deletes, tag edits, hand run SQL)
+#     inside the writing transaction, so readers see the new version exactly when they see the change
+# A cached result remembers the versions of the tables it was computed from, read on the same connection just
+# before its query, and is only served while all of them are unchanged, so a write from any worker invalidates it.
+# Plain INSERTs run outside the app don't bump anything, the TTL bounds how stale those can leave a result.
+#
+# With a read replica, table_versions replicates along with the data it describes, so a lagging replica reports
+# the versions it has actually replayed and its result is stored under those, never under the primary's newer
+# ones. A session still inside its read-your-writes window reads the primary's versions and misses until its own
+# write is in a result. Entries are keyed by (key, versions), so results at the replica's and the primary's
+# versions are kept side by side instead of evicting each other, older ones age out through the LRU and TTL.
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "128"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "60"))
+
+VERSIONED_TABLES = ("auth", "blogs", "comments", "follows")
+
+
+def create_table_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions(
+            table_name  TEXT PRIMARY KEY,
+            version     BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+
+    cursor.execute("""
+        INSERT INTO table_versions (table_name)
+        SELECT unnest(%s::text[])
+        ON CONFLICT DO NOTHING
+    """, (list(VERSIONED_TABLES),))
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # No INSERT trigger on purpose: it would hold the table's version row locked until every insert commits,
+    # serializing all posts, comments and registrations, the write paths bump after committing instead
+    for table in VERSIONED_TABLES:
+        cursor.execute(f"""
+            CREATE OR REPLACE TRIGGER trg_{table}_bump_version
+            AFTER UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+        """)
+
+
+BUMP_VERSIONS_SQL = """
+    UPDATE table_versions SET version = version + 1
+    WHERE table_name = ANY(%s)
+"""
+
+TABLE_VERSIONS_SQL = "SELECT table_name, version FROM table_versions WHERE table_name = ANY(%s)"
+
+
+def bump_version(cursor, *tables):
+    """
+    Marks tables as written to, invalidating every cached result computed from them in every process
+    Call it once the write committed, cursor must be on an autocommit connection to the primary
+    """
+    # Sorted so two statements bumping the same tables always lock their rows in the same order
+    cursor.execute(BUMP_VERSIONS_SQL, (sorted(tables),))
+
+
+def versions_from_rows(tables, rows):
+    """Orders the (table_name, version) rows TABLE_VERSIONS_SQL returned like tables, 0 for a missing row"""
+    found = dict(rows)
+    return tuple(found.get(table, 0) for table in tables)
+
+
+def table_versions(cursor, tables):
+    """
+    Snapshot of the current versions of tables, take it on the connection the cached query runs on, before running it
+    """
+    cursor.execute(TABLE_VERSIONS_SQL, (list(tables),))
+    return versions_from_rows(tables, cursor.fetchall())
+
+
+class ResultCache:
+    """LRU cache bounded by entry count and TTL, whose entries are tied to table versions"""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, versions):
+        """Returns the value cached for key at exactly these table versions, or None if it is missing or expired"""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get((key, versions))
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[(key, versions)]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((key, versions))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, versions, value):
+        """Stores value under key, versions is the table_versions snapshot taken before computing it"""
+        with self._lock:
+            self._entries[(key, versions)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((key, versions))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,181 @@
+#---------------------Libraries and packages here---------------------------#
+
+from cache import ResultCache
+import os
+#----------------------------------------------------------------------------#
+
+
+# Row counters behind the _debug endpoints the health dashboards poll (/api/blog/_debug/counters, _debug/stats,
+# /api/auth/_debug/count). Every counter comes from one statement, in one of two modes:
+#
+#   exact     summed from row_count_shards/daily_row_count_shards, which statement-level triggers keep up to date
+#             on every INSERT, DELETE and TRUNCATE of auth, blogs and comments (COPY and cascaded deletes included)
+#   estimate  totals from pg_class.reltuples (as of the last VACUUM/ANALYZE), today's counts from a range scan
+#             of the created_at indexes. No counter tables involved
+#
+# Results are cached per worker for DEBUG_COUNTERS_TTL seconds, so polling costs at most one query per interval.
+
+COUNTER_TABLES = ("auth", "blogs", "comments")
+DAILY_COUNTER_TABLES = ("blogs", "comments")
+COUNTER_MODES = ("exact", "estimate")
+
+DEBUG_COUNTERS_TTL = float(os.getenv("DEBUG_COUNTERS_TTL", "5"))
+
+# Rows each counter is spread over, a backend always adds to shard pg_backend_pid() % COUNTER_SHARDS
+# Baked into count_rows(), changing it takes a migration that runs create_counter_tables again
+COUNTER_SHARDS = 16
+
+# No table versions, entries only expire through the TTL
+counter_cache = ResultCache(max_entries=len(COUNTER_MODES), ttl=DEBUG_COUNTERS_TTL)
+
+
+# Each counter is spread over COUNTER_SHARDS rows and every backend adds to its own, readers sum them. With one row
+# per counter every register, create_blog and add_comment would queue on the same row lock until its transaction
+# committed, across every worker (and behind the feed fan-out, which runs after the counter trigger); this way two
+# writers only wait on each other when their backends share a shard.
+def create_counter_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS row_count_shards(
+            table_name  TEXT NOT NULL,
+            shard       SMALLINT NOT NULL,
+            total       BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, shard)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_row_count_shards(
+            table_name  TEXT NOT NULL,
+            day         DATE NOT NULL,
+            shard       SMALLINT NOT NULL,
+            total       BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, day, shard)
+        )
+    """)
+
+    # One statement-level trigger per table and event, fed the affected rows as a transition table, so a
+    # 50,000 row COPY costs one counter update, not 50,000
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION count_rows() RETURNS trigger AS $$
+        DECLARE
+            direction BIGINT := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+            my_shard SMALLINT := pg_backend_pid() %% %(shards)s;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM row_count_shards WHERE table_name = TG_TABLE_NAME;
+                DELETE FROM daily_row_count_shards WHERE table_name = TG_TABLE_NAME;
+                RETURN NULL;
+            END IF;
+
+            INSERT INTO row_count_shards (table_name, shard, total)
+            SELECT TG_TABLE_NAME, my_shard, direction * COUNT(*) FROM changed_rows
+            ON CONFLICT (table_name, shard) DO UPDATE SET total = row_count_shards.total + EXCLUDED.total;
+
+            IF TG_TABLE_NAME <> 'auth' THEN
+                INSERT INTO daily_row_count_shards (table_name, day, shard, total)
+                SELECT TG_TABLE_NAME, created_at::date, my_shard, direction * COUNT(*) FROM changed_rows GROUP BY 2
+                ON CONFLICT (table_name, day, shard) DO UPDATE SET total = daily_row_count_shards.total + EXCLUDED.total;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """, {"shards": COUNTER_SHARDS})
+
+    # Triggers, backfill and the locks between them go in one transaction, so no write can slip in between
+    # the counts being taken and the triggers starting to track
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("LOCK TABLE auth, blogs, comments IN SHARE MODE")
+
+        for table in COUNTER_TABLES:
+            cursor.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_count_insert
+                AFTER INSERT ON {table} REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION count_rows();
+
+                CREATE OR REPLACE TRIGGER trg_{table}_count_delete
+                AFTER DELETE ON {table} REFERENCING OLD TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION count_rows();
+
+                CREATE OR REPLACE TRIGGER trg_{table}_count_truncate
+                AFTER TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION count_rows();
+            """)
+
+            # The whole count goes in shard 0, the shards only have to add up
+            cursor.execute("DELETE FROM row_count_shards WHERE table_name = %s", (table,))
+            cursor.execute(f"""
+                INSERT INTO row_count_shards (table_name, shard, total)
+                SELECT %s, 0, COUNT(*) FROM {table}
+            """, (table,))
+
+        for table in DAILY_COUNTER_TABLES:
+            cursor.execute("DELETE FROM daily_row_count_shards WHERE table_name = %s", (table,))
+            cursor.execute(f"""
+                INSERT INTO daily_row_count_shards (table_name, day, shard, total)
+                SELECT %s, created_at::date, 0, COUNT(*) FROM {table}
+                WHERE created_at IS NOT NULL
+                GROUP BY 2
+            """, (table,))
+
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+
+# Today is [CURRENT_DATE, CURRENT_DATE + 1) so the created_at indexes serve the range, unlike DATE(created_at) = CURRENT_DATE
+COUNTERS_SQL = {
+    "exact": """
+        SELECT
+            (SELECT COALESCE(SUM(total), 0)::bigint FROM row_count_shards WHERE table_name = 'auth'),
+            (SELECT COALESCE(SUM(total), 0)::bigint FROM row_count_shards WHERE table_name = 'blogs'),
+            (SELECT COALESCE(SUM(total), 0)::bigint FROM row_count_shards WHERE table_name = 'comments'),
+            (SELECT SUM(total)::bigint FROM daily_row_count_shards WHERE table_name = 'blogs' AND day = CURRENT_DATE),
+            (SELECT SUM(total)::bigint FROM daily_row_count_shards WHERE table_name = 'comments' AND day = CURRENT_DATE)
+    """,
+    # reltuples is -1 for a table that was never vacuumed or analyzed, reported as unknown (null)
+    "estimate": """
+        SELECT
+            (SELECT NULLIF(reltuples, -1)::bigint FROM pg_class WHERE oid = 'auth'::regclass),
+            (SELECT NULLIF(reltuples, -1)::bigint FROM pg_class WHERE oid = 'blogs'::regclass),
+            (SELECT NULLIF(reltuples, -1)::bigint FROM pg_class WHERE oid = 'comments'::regclass),
+            (SELECT COUNT(*) FROM blogs WHERE created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1),
+            (SELECT COUNT(*) FROM comments WHERE created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1)
+    """,
+}
+
+
+def read_counters(pool, mode="exact"):
+    """
+    Returns {"mode", "users", "blogs", "comments", "blogs_today", "comments_today"} for mode,
+    from the cache when it is fresh, otherwise with one statement on a connection from pool
+    """
+    cached = counter_cache.get(mode, ())
+    if cached is not None:
+        return cached
+
+    conn = None
+    try:
+        conn = pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute(COUNTERS_SQL[mode])
+        users, blogs, comments, blogs_today, comments_today = cur.fetchone()
+
+    finally:
+        if conn:
+            pool.putconn(conn)
+
+    counters = {
+        "mode": mode,
+        "users": users,
+        "blogs": blogs,
+        "comments": comments,
+        # A day with no posts has no daily_row_count_shards rows
+        "blogs_today": blogs_today or 0,
+        "comments_today": comments_today or 0,
+    }
+    counter_cache.put(mode, (), counters)
+    return counters
@@ -1,25 +1,219 @@
 import psycopg2 as pg
-from psycopg2 import pool
+from psycopg2 import extensions
+from collections import deque
 import os
+import threading
+import time
 from pathlib import Path
 from dotenv import load_dotenv
+from metrics import InstrumentedCursor, observe_pool_wait, count_pool_timeout
+from server_config import pool_maxconn, read_replica_settings, READ_REPLICA_ENABLED
 
 load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
 
 
+# How long a request waits for a free connection before giving up with a 503 (Retry-After: DB_POOL_RETRY_AFTER)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+# Upper bounds (seconds) of the wait time histogram buckets, plus an implicit +Inf bucket
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# acquisitions_per_second is averaged over this many seconds
+RATE_WINDOW = 60
+
+
+class PoolTimeoutError(Exception):
+    """Raised by getconn when no connection frees up within the timeout, app.py turns it into a 503"""
+
+
+class BlockingConnectionPool:
+    """
+    Connection pool that waits for a free connection instead of raising PoolError the moment it runs out, like
+    psycopg2's ThreadedConnectionPool does. Waiters queue first come first served: putconn keeps the connection
+    open in the idle list and hands its slot straight to the longest waiting request, which picks that same
+    connection up, so a burst queues up rather than failing and never pays for a new connect or TLS handshake.
+    Connections are opened lazily (one up front) and stay open until closeall, up to maxconn of them.
+    Also keeps the numbers behind stats(): checked out, waiting, wait times, acquisition rate and timeouts
+    Wait times and timeouts also go to metrics.py under name, where they are summed across worker processes
+    """
+
+    def __init__(self, maxconn, timeout=DB_POOL_TIMEOUT, name="primary", **kwargs):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.name = name
+        self._connect_kwargs = kwargs
+
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._checked_out = 0
+        # Open connections nobody has checked out, the last one returned is handed out first
+        # One is opened here so bad settings fail at start up rather than on the first request
+        self._idle = [pg.connect(**kwargs)]
+
+        self._acquisitions = 0
+        self._timeouts = 0
+        self._wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self._wait_sum = 0.0
+        self._rate = deque()  # [second, acquisitions in that second]
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+
+        with self._lock:
+            if self._checked_out < self.maxconn and not self._waiters:
+                self._checked_out += 1
+                waiter = None
+            else:
+                waiter = threading.Event()
+                self._waiters.append(waiter)
+
+        # putconn hands its slot over by setting our event, so once it is set the slot is ours
+        if waiter is not None and not waiter.wait(timeout):
+            with self._lock:
+                if not waiter.is_set():
+                    self._waiters.remove(waiter)
+                    self._timeouts += 1
+                    count_pool_timeout(self.name)
+                    raise PoolTimeoutError(f"No database connection available within {timeout}s")
+
+        try:
+            conn = self._take_idle() or pg.connect(**self._connect_kwargs)
+        except Exception:
+            self._release_slot()
+            raise
+
+        self._record_acquisition(time.monotonic() - start)
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if close or not self._reset(conn):
+                if not conn.closed:
+                    conn.close()
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            self._release_slot()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _take_idle(self):
+        """The most recently returned open connection, None if there is none"""
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    return conn
+        return None
+
+    @staticmethod
+    def _reset(conn):
+        """Rolls back whatever conn was left in the middle of, returns False if it can't be reused"""
+        if conn.closed:
+            return False
+
+        status = conn.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except pg.Error:
+                return False
+        return True
+
+    def _release_slot(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._checked_out -= 1
+
+    def _record_acquisition(self, waited):
+        second = int(time.monotonic())
+        with self._lock:
+            self._acquisitions += 1
+            self._wait_sum += waited
+
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    self._wait_counts[i] += 1
+                    break
+            else:
+                self._wait_counts[-1] += 1
+
+            if self._rate and self._rate[-1][0] == second:
+                self._rate[-1][1] += 1
+            else:
+                self._rate.append([second, 1])
+            while self._rate and self._rate[0][0] <= second - RATE_WINDOW:
+                self._rate.popleft()
+
+        observe_pool_wait(self.name, waited)
+
+    def stats(self):
+        now = int(time.monotonic())
+        with self._lock:
+            recent = sum(count for second, count in self._rate if second > now - RATE_WINDOW)
+
+            # Cumulative counts per bucket, the way Prometheus histograms are reported
+            buckets = {}
+            running = 0
+            for bound, count in zip(WAIT_BUCKETS + ("+Inf",), self._wait_counts):
+                running += count
+                buckets[str(bound)] = running
+
+            return {
+                "maxconn": self.maxconn,
+                "checked_out": self._checked_out,
+                "waiting": len(self._waiters),
+                "acquisitions": self._acquisitions,
+                "acquisitions_per_second": round(recent / RATE_WINDOW, 3),
+                "timeouts": self._timeouts,
+                "wait_seconds": {
+                    "buckets": buckets,
+                    "sum": round(self._wait_sum, 6),
+                    "count": self._acquisitions,
+                },
+            }
+
+
+PRIMARY_SETTINGS = {
+    "dbname": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASS"),
+    "host": os.getenv("DB_HOST"),
+    "port": os.getenv("DB_PORT"),
+    "sslmode": os.getenv("DB_SSLMODE", "require"),
+}
+
+# Shared by every connection either pool opens, InstrumentedCursor feeds each request's DB time and query count to metrics.py
+CONNECTION_OPTIONS = {
+    "cursor_factory": InstrumentedCursor,
+    "connect_timeout": 10,
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
 # Using a pool to keep connection open and handle concurrent connections, also reuses existing connections.
-db_pool = pool.ThreadedConnectionPool(
-                minconn= 1,
-                maxconn= 10,
-                dbname=os.getenv("DB_NAME"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASS"),
-                host=os.getenv("DB_HOST"),
-                port=os.getenv("DB_PORT"),
-                sslmode=os.getenv("DB_SSLMODE", "require"),
-                connect_timeout=10,
-                keepalives=1,
-                keepalives_idle=30,
-                keepalives_interval=10,
-                keepalives_count=5
+# Every worker process has its own pool, maxconn comes from server_config so all workers together stay under DB_MAX_CONNECTIONS
+db_pool = BlockingConnectionPool(
+                maxconn= pool_maxconn(),
+                **PRIMARY_SETTINGS,
+                **CONNECTION_OPTIONS
             )
+
+# Read replica pool, None unless DB_READ_HOST is set. Sized like db_pool, the replica has its own connection limit
+# Only read_only routes use it, through routing.request_pool()
+read_pool = None
+if READ_REPLICA_ENABLED:
+    read_pool = BlockingConnectionPool(maxconn=pool_maxconn(), name="replica", **read_replica_settings(),
+                                       **CONNECTION_OPTIONS)
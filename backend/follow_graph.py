@@ -0,0 +1,164 @@
+#---------------------Libraries and packages here---------------------------#
+
+from queries import QUERY3_SQL, query3_params, FOLLOWEES_OF_SQL, USERS_BY_USERNAME_SQL
+from collections import OrderedDict
+from bisect import bisect_left
+import os
+import threading
+import time
+#----------------------------------------------------------------------------#
+
+
+# Common followees of N users (query3 and GET /api/users/common-followees), with an optional in-process cache of
+# who each user follows
+#
+#   FOLLOW_GRAPH_CACHE_SIZE   users whose followee lists are kept per worker, 0 (default) turns the cache off
+#   FOLLOW_GRAPH_TTL          seconds before a kept list is read again
+#
+# Without the cache the intersection is QUERY3_SQL's GROUP BY over the follows primary key. With it, each user's
+# followees are kept as a sorted tuple, lists missing from the cache are read in one query, and the intersection
+# is done here: walk the shortest list and binary search the others, so it costs
+# len(shortest) * log(len(longest)) and stops as soon as any list runs out.
+#
+# follow/unfollow (follows.py) invalidate the follower's list in this process. Like cache.py, writes handled by
+# another worker process, or a list read from a lagging read replica right after a write, are only bounded by the TTL.
+
+FOLLOW_GRAPH_CACHE_SIZE = int(os.getenv("FOLLOW_GRAPH_CACHE_SIZE", "0"))
+FOLLOW_GRAPH_TTL = float(os.getenv("FOLLOW_GRAPH_TTL", "60"))
+
+
+def intersect_sorted(lists):
+    """Items found in every one of lists, each sorted and without duplicates, returned sorted"""
+    if not lists:
+        return []
+
+    lists = sorted(lists, key=len)
+    smallest, others = lists[0], lists[1:]
+    starts = [0] * len(others)  # nothing before these positions can match a later (larger) item
+
+    common = []
+    for item in smallest:
+        for i, other in enumerate(others):
+            position = bisect_left(other, item, starts[i])
+            if position == len(other):
+                return common
+            starts[i] = position
+            if other[position] != item:
+                break
+        else:
+            common.append(item)
+    return common
+
+
+class FollowGraph:
+    """LRU cache of username -> sorted tuple of the usernames they follow, bounded by user count and TTL"""
+
+    def __init__(self, max_users=FOLLOW_GRAPH_CACHE_SIZE, ttl=FOLLOW_GRAPH_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()  # username -> (expires at, followees)
+        # username -> [reads in flight, writes seen since the first of them started], only while a read is in flight
+        # A list read before a write must not be stored after it, and nothing is kept for users nobody is reading
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def invalidate(self, follower):
+        """Drops follower's list, call it after their follow or unfollow committed"""
+        with self._lock:
+            loading = self._loading.get(follower)
+            if loading is not None:
+                loading[1] += 1
+            self._entries.pop(follower, None)
+
+    def followees(self, cursor, usernames):
+        """Returns {username: sorted tuple of followees} for usernames, reading the missing ones with one query"""
+        now = time.monotonic()
+        found = {}
+        missing = []
+
+        with self._lock:
+            for username in usernames:
+                entry = self._entries.get(username)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(username)
+                    found[username] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(username)
+                    self.misses += 1
+            writes = {}
+            for username in missing:
+                loading = self._loading.setdefault(username, [0, 0])
+                loading[0] += 1
+                writes[username] = loading[1]
+
+        if not missing:
+            return found
+
+        try:
+            cursor.execute(FOLLOWEES_OF_SQL, (missing,))
+            loaded = {username: [] for username in missing}
+            for follower, followed in cursor.fetchall():
+                loaded[follower].append(followed)
+
+            # Sorted here rather than with ORDER BY, the database's collation need not match Python's string order
+            expires = time.monotonic() + self.ttl
+            with self._lock:
+                for username, followed in loaded.items():
+                    found[username] = tuple(sorted(followed))
+                    if self._loading[username][1] != writes[username]:
+                        continue
+                    self._entries[username] = (expires, found[username])
+                    self._entries.move_to_end(username)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        finally:
+            with self._lock:
+                for username in missing:
+                    loading = self._loading[username]
+                    loading[0] -= 1
+                    if loading[0] == 0:
+                        del self._loading[username]
+
+        return found
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._entries),
+                "max_users": self.max_users,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+follow_graph = FollowGraph() if FOLLOW_GRAPH_CACHE_SIZE > 0 else None
+
+
+def invalidate_follower(follower):
+    if follow_graph is not None:
+        follow_graph.invalidate(follower)
+
+
+def common_followee_rows(cursor, usernames):
+    """(username, firstname, lastname) of the users followed by every one of usernames, ordered by username"""
+    if follow_graph is None:
+        cursor.execute(QUERY3_SQL, query3_params(usernames))
+        return cursor.fetchall()
+
+    lists = follow_graph.followees(cursor, usernames)
+    common = intersect_sorted(list(lists.values()))
+    if not common:
+        return []
+
+    cursor.execute(USERS_BY_USERNAME_SQL, (common,))
+    return cursor.fetchall()
@@ -0,0 +1,188 @@
+from flask import Blueprint, request, session, jsonify
+from db_conn import db_pool, PoolTimeoutError
+from routing import request_pool, read_only, writes
+from cache import bump_version
+from follow_graph import follow_graph, invalidate_follower, common_followee_rows
+from queries import (
+    QueryRequestError, parse_follow_page, follow_page_params, follow_page_response, parse_common_followee_users,
+    FOLLOWING_SQL, FOLLOWERS_SQL, FOLLOW_SQL, UNFOLLOW_SQL, user_row_to_dict,
+)
+import psycopg2 as pg
+
+
+#----------------------------------------Blueprint Init--------------------------------------------------------------------#
+
+
+# Follow graph endpoints, registered under /api/users:
+#   POST/DELETE  /<username>/follow       follow or unfollow username as the logged in user
+#   GET          /<username>/followers    who follows username, a page at a time (?limit=&cursor=)
+#   GET          /<username>/following    who username follows, a page at a time
+#   GET          /common-followees        users followed by every one of ?users=a,b,c (see follow_graph.py)
+follows_bp = Blueprint('follows', __name__)
+
+
+#-----------------------------------------------------Follow/Unfollow----------------------------------------------------------------------#
+
+@follows_bp.route('/<username>/follow', methods=['POST'])
+@writes
+def follow_user(username):
+    conn = None
+
+    follower = session.get('username')
+    if not follower:
+        return jsonify({"error": "Please log in first before following users"}), 401
+
+    if follower == username:
+        return jsonify({"error": "You can't follow yourself"}), 400
+
+    try:
+        conn = db_pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        # ON CONFLICT DO NOTHING returns no row when the follow already exists
+        cur.execute(FOLLOW_SQL, (follower, username))
+        row = cur.fetchone()
+        if not row:
+            return jsonify({"message": f"You already follow {username}", "username": username}), 200
+
+        invalidate_follower(follower)
+        bump_version(cur, "follows")
+
+        return jsonify({"message": f"You now follow {username}", "username": username, "followed_at": row[0]}), 201
+
+    # The only foreign key left to fail is the followed user's, the follower comes from the session
+    except pg.errors.ForeignKeyViolation:
+        return jsonify({"error": "User not found"}), 404
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
+    except pg.Error as e:
+        print(f"Database error while following user: {e}")
+        return jsonify({"error": "Database error"}), 500
+
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+
+@follows_bp.route('/<username>/follow', methods=['DELETE'])
+@writes
+def unfollow_user(username):
+    conn = None
+
+    follower = session.get('username')
+    if not follower:
+        return jsonify({"error": "Please log in first before unfollowing users"}), 401
+
+    try:
+        conn = db_pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        cur.execute(UNFOLLOW_SQL, (follower, username))
+        if not cur.fetchone():
+            return jsonify({"error": f"You don't follow {username}"}), 404
+
+        invalidate_follower(follower)
+        bump_version(cur, "follows")
+
+        return jsonify({"message": f"You no longer follow {username}", "username": username}), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
+    except pg.Error as e:
+        print(f"Database error while unfollowing user: {e}")
+        return jsonify({"error": "Database error"}), 500
+
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+
+#-----------------------------------------------------Followers/Following----------------------------------------------------------------------#
+
+def follow_page(username, sql, name):
+    """One page of FOLLOWERS_SQL or FOLLOWING_SQL for username, with the limit and cursor from the query string"""
+    try:
+        page = parse_follow_page(request.args)
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = None
+    pool = request_pool()
+    try:
+        conn = pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        cur.execute(sql, follow_page_params(username, page))
+        rows = cur.fetchall()
+
+        return jsonify(follow_page_response(username, page, rows)), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
+    except Exception as e:
+        print(f"[{name}] Error:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    finally:
+        if conn:
+            pool.putconn(conn)
+
+
+@follows_bp.route('/<username>/followers', methods=['GET'])
+@read_only
+def list_followers(username):
+    return follow_page(username, FOLLOWERS_SQL, "FOLLOWERS")
+
+
+@follows_bp.route('/<username>/following', methods=['GET'])
+@read_only
+def list_following(username):
+    return follow_page(username, FOLLOWING_SQL, "FOLLOWING")
+
+
+@follows_bp.route('/common-followees', methods=['GET'])
+@read_only
+def common_followees():
+    try:
+        usernames = parse_common_followee_users(request.args.get("users", ""))
+    except QueryRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = None
+    pool = request_pool()
+    try:
+        conn = pool.getconn()
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        rows = common_followee_rows(cur, usernames)
+
+        return jsonify({"users": [user_row_to_dict(row) for row in rows], "of": usernames}), 200
+
+    # Left for app.py's 503 handler
+    except PoolTimeoutError:
+        raise
+
+    except Exception as e:
+        print("[COMMON_FOLLOWEES] Error:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    finally:
+        if conn:
+            pool.putconn(conn)
+
+
+@follows_bp.route('/_debug/graph', methods=['GET'])
+def _debug_graph():
+    # Hit/miss counts of this worker's follow graph cache, null when FOLLOW_GRAPH_CACHE_SIZE is 0
+    return jsonify(follow_graph.stats() if follow_graph else None), 200
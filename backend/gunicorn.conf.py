@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# gunicorn reads this file before it changes into the app directory, so make server_config importable first
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from server_config import WORKER_CLASS, WEB_WORKERS, WEB_THREADS, WORKER_CONNECTIONS, pool_maxconn
+
+
+# Production entry point, run from backend/ with:
+#   gunicorn -c gunicorn.conf.py app:app
+# See server_config.py for the environment variables that pick the worker class and sizes.
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = WEB_WORKERS
+worker_class = WORKER_CLASS
+
+if WORKER_CLASS == "gthread":
+    threads = WEB_THREADS
+elif WORKER_CLASS == "gevent":
+    worker_connections = WORKER_CONNECTIONS
+
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+
+# Recycles workers now and then so a slow leak in one can't grow forever, jitter keeps them from restarting together
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "1000"))
+
+# The app (and its connection pool) is loaded in each worker after forking, never shared across processes
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+# Shared by the workers' metrics (see metrics.py), so /metrics on any worker reports the whole server
+# Set before the workers import the app, prometheus_client reads it at import
+METRICS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "blog-metrics"))
+
+
+def on_starting(server):
+    # Files left by a previous run would be added to this one's counts
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR)
+
+
+def post_fork(server, worker):
+    # psycopg2 blocks in C, under gevent it has to hand waits back to the event loop or one query stalls every greenlet
+    if WORKER_CLASS == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            raise RuntimeError("WORKER_CLASS=gevent needs the gevent and psycogreen packages installed")
+        patch_psycopg()
+
+
+def child_exit(server, worker):
+    # Drops the exited worker's pool gauges, its counters and histograms stay in the totals
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    server.log.info(
+        f"[APP] {WEB_WORKERS} {WORKER_CLASS} workers, up to {pool_maxconn()} DB connections each "
+        f"({WEB_WORKERS * pool_maxconn()} total)"
+    )
@@ -0,0 +1,172 @@
+#---------------------Libraries and packages here---------------------------#
+
+from flask import request, Response
+from psycopg2 import extensions
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from contextvars import ContextVar
+import slow_queries
+import os
+import time
+#----------------------------------------------------------------------------#
+
+
+# Request metrics in Prometheus' text format, served at GET /metrics
+#
+# Every request is recorded under its route rule (ex: /api/blog/<int:blog_id>, so ids don't each get their own series):
+#   http_request_duration_seconds   latency histogram
+#   http_requests_total             count by status code
+#   db_time_seconds                 time spent inside cursor.execute per request
+#   db_queries_per_request          statements executed per request
+#   db_rows_per_request             rows returned by those statements
+# DB numbers come from InstrumentedCursor, which db_conn.py makes the cursor class of every pooled connection.
+# It also hands every statement run during a request to slow_queries.py.
+#
+# Under gunicorn every worker writes its numbers to PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py) and
+# whichever worker answers /metrics reports the sum over all of them, so one scrape through the load balancer sees
+# the whole server. Counts of recycled workers (max_requests) stay in the sum, their pool gauges are dropped by
+# gunicorn.conf.py's child_exit. Without PROMETHEUS_MULTIPROC_DIR (flask run) the numbers are this process's.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+ROW_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# Same bounds as BlockingConnectionPool's own wait histogram (db_conn.WAIT_BUCKETS)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+ROUTE_LABELS = ("method", "route")
+
+_latency = Histogram("http_request_duration_seconds", "Request latency in seconds", ROUTE_LABELS,
+                     buckets=LATENCY_BUCKETS)
+_db_time = Histogram("db_time_seconds", "Time spent executing SQL per request, in seconds", ROUTE_LABELS,
+                     buckets=LATENCY_BUCKETS)
+_queries = Histogram("db_queries_per_request", "SQL statements executed per request", ROUTE_LABELS,
+                     buckets=QUERY_COUNT_BUCKETS)
+_rows = Histogram("db_rows_per_request", "Rows returned by SQL statements per request", ROUTE_LABELS,
+                  buckets=ROW_COUNT_BUCKETS)
+_requests = Counter("http_requests", "Requests handled, by status code", ROUTE_LABELS + ("status",))
+
+# livesum: added up over the workers that are still running
+_pool_connections = Gauge("db_pool_connections", "Connections checked out and requests waiting for one",
+                          ("pool", "state"), multiprocess_mode="livesum")
+_pool_wait = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("pool",),
+                       buckets=POOL_WAIT_BUCKETS)
+_pool_timeouts = Counter("db_pool_timeouts", "Requests that gave up waiting for a connection", ("pool",))
+
+_pools = ()  # (name, pool) pairs given to init_metrics
+
+
+#---------------------------------------------------------Per Request DB Stats---------------------------------------------------------------#
+
+class RequestStats:
+    __slots__ = ("route", "started", "db_seconds", "queries", "rows")
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+
+# Stats of the request being handled, None outside a request (CLI tools, start up)
+# A context variable rather than flask.g so the cursor needs no request context, it is per thread/greenlet either way
+_current = ContextVar("request_stats", default=None)
+
+
+class InstrumentedCursor(extensions.cursor):
+    """psycopg2 cursor that adds the duration and row count of every statement to the current request's stats"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                elapsed = time.perf_counter() - start
+                stats.db_seconds += elapsed
+                stats.queries += 1
+                if self.description is not None:
+                    stats.rows += max(self.rowcount, 0)
+                slow_queries.record(query, vars, elapsed, stats.route)
+
+
+def current_stats():
+    return _current.get()
+
+
+#---------------------------------------------------------Middleware---------------------------------------------------------------#
+
+def route_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def start_request():
+    _current.set(RequestStats(route_label()))
+
+
+def record_request(response):
+    stats = _current.get()
+    if stats is None or request.path == "/metrics":
+        return response
+
+    elapsed = time.perf_counter() - stats.started
+    labels = (request.method, stats.route)
+
+    _latency.labels(*labels).observe(elapsed)
+    _db_time.labels(*labels).observe(stats.db_seconds)
+    _queries.labels(*labels).observe(stats.queries)
+    _rows.labels(*labels).observe(stats.rows)
+    _requests.labels(*labels, str(response.status_code)).inc()
+    update_pool_gauges()
+
+    _current.set(None)
+    return response
+
+
+#---------------------------------------------------------Pools---------------------------------------------------------------#
+
+def observe_pool_wait(pool_name, seconds):
+    """Called by BlockingConnectionPool every time it hands out a connection"""
+    _pool_wait.labels(pool_name).observe(seconds)
+
+
+def count_pool_timeout(pool_name):
+    """Called by BlockingConnectionPool when a request gives up waiting for a connection"""
+    _pool_timeouts.labels(pool_name).inc()
+
+
+def update_pool_gauges():
+    """
+    Copies this worker's checked out, waiting and max connections into the pool gauges
+    Another worker can't read them from here, so each worker does it after every request it handles
+    """
+    for name, pool in _pools:
+        stats = pool.stats()
+        _pool_connections.labels(name, "checked_out").set(stats["checked_out"])
+        _pool_connections.labels(name, "waiting").set(stats["waiting"])
+        _pool_connections.labels(name, "max").set(stats["maxconn"])
+
+
+def render_metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def init_metrics(app, pools=()):
+    """Records every request of app and serves the metrics, plus pools' usage, at /metrics"""
+    global _pools
+    _pools = tuple(pools)
+
+    app.before_request(start_request)
+    app.after_request(record_request)
+
+    @app.route("/metrics")
+    def metrics():
+        update_pool_gauges()
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
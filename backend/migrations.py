@@ -0,0 +1,207 @@
+#---------------------Libraries and packages here---------------------------#
+
+from db_conn import db_pool
+import psycopg2 as pg
+import argparse
+#----------------------------------------------------------------------------#
+
+
+# Versioned schema migrations, run once per deploy as a separate command instead of on every app start:
+#   cd backend
+#   python migrations.py            (applies every pending migration in order)
+#   python migrations.py --status   (prints the database's version and what is pending)
+# create_app only compares schema_version against LATEST_VERSION and warns if the database is behind.
+#
+# Migrations run in autocommit so indexes can be built with CREATE INDEX CONCURRENTLY (not allowed inside a
+# transaction) without blocking writes on live tables. That means a migration isn't atomic: write each one so it
+# can be re-run after a failure (IF NOT EXISTS, CREATE OR REPLACE, ON CONFLICT), its version is only recorded
+# once every statement in it succeeded.
+
+
+# Any constant works, it only has to be the same for every runner so two deploys can't migrate at once
+MIGRATION_LOCK_KEY = 4402025
+
+
+def create_index(cursor, name, definition, unique=False):
+    """
+    Builds index name (definition is everything after the name, ex: "ON blogs(username)") with CONCURRENTLY
+    A concurrent build that fails leaves an INVALID index behind, which IF NOT EXISTS would then skip forever,
+    so one is dropped and rebuilt
+    """
+    cursor.execute("""
+        SELECT NOT i.indisvalid
+        FROM pg_index i
+        WHERE i.indexrelid = to_regclass(%s)
+    """, (name,))
+    row = cursor.fetchone()
+    if row and row[0]:
+        print(f"[MIGRATE] Rebuilding invalid index {name}")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    unique_sql = "UNIQUE " if unique else ""
+    cursor.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+
+#-----------------------------------------------------Migrations----------------------------------------------------------------------#
+
+# Tables are imported inside each migration, blog.py imports create_index from here
+
+def base_schema(cursor):
+    # Everything create_app used to run at start up, idempotent so it also brings databases created by older
+    # versions of the app up to date
+    from auth import create_auth_table
+    from blog import create_blog_tables
+
+    create_auth_table(cursor)
+    create_blog_tables(cursor)
+
+
+def row_counters(cursor):
+    from counters import create_counter_tables
+
+    create_counter_tables(cursor)
+
+
+def user_day_tags(cursor):
+    from blog import create_user_day_tags
+
+    create_user_day_tags(cursor)
+
+
+def blogs_created_at_username_index(cursor):
+    from blog import BLOGS_CREATED_AT_USERNAME_INDEX
+
+    create_index(cursor, *BLOGS_CREATED_AT_USERNAME_INDEX)
+
+
+def follows_followed_index(cursor):
+    from blog import FOLLOWS_FOLLOWED_INDEX
+
+    create_index(cursor, *FOLLOWS_FOLLOWED_INDEX)
+
+
+def feed_timelines(cursor):
+    from blog import create_feed_timelines
+
+    create_feed_timelines(cursor)
+
+
+def shared_table_versions(cursor):
+    from cache import create_table_versions
+
+    create_table_versions(cursor)
+
+
+# (version, description, function taking a cursor), in the order they are applied. Append new ones, never reorder
+# or edit one that has shipped: databases that already recorded its version won't run it again.
+MIGRATIONS = [
+    (1, "Base schema: auth, blogs, comments, follows, tag index, daily quotas, comment function, sentiment stats",
+     base_schema),
+    (2, "Trigger maintained row counters for the _debug endpoints", row_counters),
+    (3, "user_day_tags for query1", user_day_tags),
+    (4, "Covering created_at index for query2's date ranges", blogs_created_at_username_index),
+    (5, "Reverse follows index for the followers pages", follows_followed_index),
+    (6, "Fan-out on write timelines for /api/blog/feed", feed_timelines),
+    (7, "table_versions, shared result cache invalidation", shared_table_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+#-----------------------------------------------------Runner----------------------------------------------------------------------#
+
+def create_schema_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version(
+            version      INTEGER PRIMARY KEY,
+            description  TEXT NOT NULL,
+            applied_at   TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def current_version(cursor):
+    """Highest applied migration, 0 if none have run. Raises UndefinedTable if schema_version doesn't exist"""
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def pending_migrations(version):
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def migrate(conn):
+    """Applies every migration newer than the database's version, in order, returns how many ran"""
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    # Session level lock, a second runner waits here and then finds nothing left to do
+    cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        create_schema_version_table(cur)
+        version = current_version(cur)
+        pending = pending_migrations(version)
+
+        if not pending:
+            print(f"[MIGRATE] Schema is up to date (version {version})")
+            return 0
+
+        for number, description, migration in pending:
+            print(f"[MIGRATE] Applying {number}: {description}")
+            migration(cur)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (number, description)
+            )
+
+        print(f"[MIGRATE] Schema migrated from version {version} to {pending[-1][0]}")
+        return len(pending)
+
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+
+
+def check_schema_version(cursor):
+    """
+    The one query create_app runs at start up: warns if the database is missing migrations
+    Returns the database's version, or None if it has never been migrated
+    """
+    try:
+        version = current_version(cursor)
+    except pg.errors.UndefinedTable:
+        print("[APP] Database has no schema_version table, run: python migrations.py")
+        return None
+
+    if version < LATEST_VERSION:
+        print(f"[APP] Database schema is at version {version}, the app expects {LATEST_VERSION}, "
+              f"run: python migrations.py")
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only print the current version and pending migrations")
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        conn = db_pool.getconn()
+
+        if args.status:
+            conn.autocommit = True
+            cur = conn.cursor()
+            create_schema_version_table(cur)
+            version = current_version(cur)
+            print(f"[MIGRATE] Database is at version {version}, latest is {LATEST_VERSION}")
+            for number, description, _ in pending_migrations(version):
+                print(f"[MIGRATE] Pending {number}: {description}")
+        else:
+            migrate(conn)
+
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+
+if __name__ == "__main__":
+    main()
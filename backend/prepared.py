@@ -0,0 +1,105 @@
+#---------------------Libraries and packages here---------------------------#
+
+import psycopg2 as pg
+import os
+import re
+import threading
+import weakref
+#----------------------------------------------------------------------------#
+
+
+# Named prepared statements for the hot queries
+# Each statement is registered once at import with its %s SQL and parameter types. The first time a pooled connection
+# runs it, execute() sends PREPARE name (types) AS ..., after that only EXECUTE name (params) goes over the wire,
+# so Postgres skips parsing and analysis and can reuse a cached plan once it sees a generic plan is as good.
+# db_conn.BlockingConnectionPool keeps returned connections open for the next request, so a statement is prepared at
+# most once per pooled connection (maxconn times per worker), not per request. benchmarks/prepared.py checks this.
+#
+# Set DB_PREPARED_STATEMENTS=0 to send the plain SQL instead, ex: behind a transaction pooling pgbouncer, where the
+# next request may land on a server connection that never saw the PREPARE.
+PREPARED_STATEMENTS_ENABLED = os.getenv("DB_PREPARED_STATEMENTS", "1") != "0"
+
+# name -> (sql with %s placeholders, sql with $n placeholders, parameter types)
+STATEMENTS = {}
+
+# connection -> names prepared on it, entries disappear with the connection
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+def to_positional(sql):
+    """Rewrites psycopg2's %s placeholders into PREPARE's $1, $2, ... (%% becomes a literal %), returns (sql, count)"""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group() == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(replace, sql), count
+
+
+def register(name, sql, param_types=()):
+    """
+    Adds a statement to the registry and returns its name, for execute()
+    param_types are Postgres type names in placeholder order, declaring them up front means a NULL or an untyped
+    literal can never make PREPARE guess a different type than the column has
+    """
+    positional, count = to_positional(sql)
+    if count != len(param_types):
+        raise ValueError(f"Statement {name} has {count} placeholders but {len(param_types)} parameter types")
+    if name in STATEMENTS and STATEMENTS[name][0] != sql:
+        raise ValueError(f"Statement {name} is already registered with different SQL")
+
+    STATEMENTS[name] = (sql, positional, tuple(param_types))
+    return name
+
+
+def prepared_names(conn):
+    with _prepared_lock:
+        return _prepared.setdefault(conn, set())
+
+
+def prepare(cursor, name):
+    _, positional, param_types = STATEMENTS[name]
+    types_sql = f" ({', '.join(param_types)})" if param_types else ""
+
+    try:
+        cursor.execute(f"PREPARE {name}{types_sql} AS {positional}")
+    except pg.errors.DuplicatePreparedStatement:
+        # Prepared on this session by something that didn't go through the registry, it is the same statement
+        pass
+
+    prepared_names(cursor.connection).add(name)
+
+
+def execute(cursor, name, params=()):
+    """Runs a registered statement on cursor, preparing it first if this connection hasn't yet"""
+    sql, _, _ = STATEMENTS[name]
+    if not PREPARED_STATEMENTS_ENABLED:
+        cursor.execute(sql, params)
+        return
+
+    names = prepared_names(cursor.connection)
+    if name not in names:
+        prepare(cursor, name)
+
+    execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+
+    try:
+        cursor.execute(execute_sql, params)
+    except pg.errors.InvalidSqlStatementName:
+        # The session lost it (DEALLOCATE, DISCARD ALL), prepare again and retry once
+        names.discard(name)
+        prepare(cursor, name)
+        cursor.execute(execute_sql, params)
+
+
+def deallocate_all(cursor):
+    """Drops every prepared statement on cursor's connection, ex: before changing its search_path"""
+    cursor.execute("DEALLOCATE ALL")
+    prepared_names(cursor.connection).clear()
@@ -0,0 +1,834 @@
+#---------------------Libraries and packages here---------------------------#
+
+from collections.abc import Mapping
+from datetime import date, datetime
+import base64
+import hashlib
+import json
+#----------------------------------------------------------------------------#
+
+
+# SQL and request helpers for the read endpoints, shared by the Flask blueprint (blog.py), the async app (async_blog.py)
+# and the benchmarks, so every path runs exactly the same statements
+# Nothing here touches a connection, callers execute the SQL with whichever driver they use (both use %s placeholders)
+
+
+#---------------------------------------------------------Search Helpers---------------------------------------------------------------#
+
+# Page size used by /search when the client does not send a limit, and the largest page a client may ask for
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+# How /search matches the tag against blog_tags.tag_lower, every mode is served by an index on blog_tags
+#   exact    -> tag_lower = 'tag'         (primary key / text_pattern_ops)
+#   prefix   -> tag_lower LIKE 'tag%'     (text_pattern_ops)
+#   contains -> tag_lower LIKE '%tag%'    (gin_trgm_ops), the default since it matches the original search behaviour
+TAG_SEARCH_PREDICATES = {
+    "exact": "bt.tag_lower = %s",
+    "prefix": "bt.tag_lower LIKE %s",
+    "contains": "bt.tag_lower LIKE %s",
+}
+DEFAULT_TAG_SEARCH_MODE = "contains"
+
+
+# blogs.blog_id is a BIGSERIAL
+MAX_BLOG_ID = 2**63 - 1
+
+
+class SearchRequestError(Exception):
+    """Raised by parse_search_request with the message to send back as a 400"""
+
+
+def parse_page_limit(raw_limit):
+    """
+    Parses the page size requested by the client
+    Returns the limit clamped to [1, MAX_PAGE_LIMIT], or None if it is not a number
+    """
+    if raw_limit is None or raw_limit == '':
+        return DEFAULT_PAGE_LIMIT
+
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        return None
+
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+
+def encode_cursor(created_at, blog_id):
+    """
+    Encodes the (created_at, blog_id) of the last row on a page into an opaque token
+    The client only passes it back to get the next page, it should never parse it
+    """
+    raw = json.dumps([created_at.isoformat(), blog_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a token made by encode_cursor back into (created_at, blog_id)
+    Returns None if the token is malformed, including a blog_id no blogs row can have
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, blog_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at, blog_id = datetime.fromisoformat(created_at), int(blog_id)
+    # OverflowError: a blog_id of 1e400 decodes to inf
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+    # Out of range it would only fail later in Postgres, as a DataError instead of a 400
+    if not 1 <= blog_id <= MAX_BLOG_ID:
+        return None
+    return created_at, blog_id
+
+
+def tag_search_pattern(tag, mode):
+    """
+    Builds the value bound to the TAG_SEARCH_PREDICATES entry for mode
+    LIKE wildcards typed by the user are escaped so they match literally
+    """
+    tag = tag.lower()
+    if mode == "exact":
+        return tag
+
+    escaped = tag.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    if mode == "prefix":
+        return f"{escaped}%"
+    return f"%{escaped}%"
+
+
+def parse_search_request(data):
+    """
+    Reads tag, mode, limit and cursor from the request's JSON body or query string
+    Returns a dict with the parsed values, raises SearchRequestError if any of them is invalid
+    """
+    # A JSON body can send any type, only strings have .strip()
+    if not isinstance(data, Mapping):
+        raise SearchRequestError("Request body must be a JSON object")
+    for name in ('tag', 'mode'):
+        if data.get(name) is not None and not isinstance(data.get(name), str):
+            raise SearchRequestError(f"{name} must be a string")
+
+    tag = (data.get('tag') or '').strip()
+    mode = (data.get('mode') or DEFAULT_TAG_SEARCH_MODE).strip().lower()
+    raw_cursor = data.get('cursor')
+
+    if not tag:
+        raise SearchRequestError("Tag parameter is required")
+
+    if mode not in TAG_SEARCH_PREDICATES:
+        raise SearchRequestError(f"mode must be one of: {', '.join(TAG_SEARCH_PREDICATES)}")
+
+    limit = parse_page_limit(data.get('limit'))
+    if limit is None:
+        raise SearchRequestError("limit must be a number")
+
+    # The cursor is the (created_at, blog_id) of the last blog on the previous page
+    after = None
+    if raw_cursor:
+        after = decode_cursor(str(raw_cursor))
+        if after is None:
+            raise SearchRequestError("Invalid cursor")
+
+    return {"tag": tag, "mode": mode, "limit": limit, "cursor": raw_cursor or "", "after": after}
+
+
+def make_etag(*parts):
+    """Builds an ETag value from the parts that identify a response's current content"""
+    raw = ":".join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+#---------------------------------------------------------Search/View SQL---------------------------------------------------------------#
+
+# What a search page's ETag is derived from, far cheaper than running the search:
+#   the blogs version from table_versions (see cache.py), bumped by create_blog, bulk loads, and the triggers on
+#   every UPDATE (tag edits), DELETE (the auth cascade included) and TRUNCATE of blogs
+#   the highest blog_id, read straight off the primary key index, covers blogs INSERTed outside the app
+SEARCH_VERSION_SQL = """
+    SELECT
+        (SELECT MAX(blog_id) FROM blogs),
+        (SELECT version FROM table_versions WHERE table_name = 'blogs')
+"""
+
+# The tag lookup runs against blog_tags so it is an index scan, the blog rows are then fetched by primary key
+# Seeking past the cursor with a row comparison keeps every page an index range scan, no matter how deep the client scrolls
+# Callers fetch limit + 1 rows so they know whether there is a next page without running a COUNT(*)
+SEARCH_SQL = """
+    SELECT 
+        blog_id,
+        username,
+        subject,
+        description,
+        tags,
+        created_at
+    FROM blogs
+    WHERE blog_id IN (
+        SELECT bt.blog_id FROM blog_tags bt
+        WHERE {predicate}
+    )
+    AND (%s::timestamptz IS NULL OR (created_at, blog_id) < (%s::timestamptz, %s::bigint))
+    ORDER BY created_at DESC, blog_id DESC
+    LIMIT %s
+"""
+
+
+def search_sql(mode):
+    return SEARCH_SQL.format(predicate=TAG_SEARCH_PREDICATES[mode])
+
+
+def search_params(search):
+    """Parameters for search_sql, from a dict returned by parse_search_request"""
+    after = search["after"]
+    return (
+        tag_search_pattern(search["tag"], search["mode"]),
+        after[0] if after else None,
+        after[0] if after else None,
+        after[1] if after else None,
+        search["limit"] + 1,
+    )
+
+
+def search_response(search, rows):
+    """Builds the /search JSON payload from the rows search_sql returned"""
+    limit = search["limit"]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    blogs = [blog_row_to_dict(row) for row in rows]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last[5], last[0])
+
+    return {
+        "tag": search["tag"],
+        "mode": search["mode"],
+        "count": len(blogs),
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "blogs": blogs
+    }
+
+
+# One lightweight query both checks the blog exists and gives its version: blogs are never edited,
+# so the content only changes when a comment is added or removed
+BLOG_VERSION_SQL = """
+    SELECT COUNT(c.comment_id), MAX(c.comment_id)
+    FROM blogs b
+    LEFT JOIN comments c ON c.blog_id = b.blog_id
+    WHERE b.blog_id = %s
+    GROUP BY b.blog_id
+"""
+
+BLOG_SQL = """
+    SELECT 
+        blog_id,
+        username,
+        subject,
+        description,
+        tags,
+        created_at
+    FROM blogs
+    WHERE blog_id = %s
+"""
+
+BLOG_COMMENTS_SQL = """
+    SELECT 
+        comment_id,
+        username,
+        sentiment,
+        description,
+        created_at
+    FROM comments
+    WHERE blog_id = %s
+    ORDER BY created_at DESC
+"""
+
+
+def blog_etag(blog_id, version):
+    return make_etag("blog", blog_id, version[0], version[1] or 0)
+
+
+def search_etag(search, version):
+    """version is the (latest blog_id, blogs version) row SEARCH_VERSION_SQL returned"""
+    return make_etag(
+        "search", search["tag"].lower(), search["mode"], search["limit"], search["cursor"],
+        version[0] or 0, version[1] or 0,
+    )
+
+
+def blog_row_to_dict(row):
+    return {
+        "blog_id": row[0],
+        "username": row[1],
+        "subject": row[2],
+        "description": row[3],
+        "tags": row[4],
+        "created_at": row[5]
+    }
+
+
+def comment_row_to_dict(row):
+    return {
+        "comment_id": row[0],
+        "username": row[1],
+        "sentiment": row[2],
+        "description": row[3],
+        "created_at": row[4]
+    }
+
+
+def user_row_to_dict(row):
+    return {
+        "username": row[0],
+        "firstname": row[1],
+        "lastname": row[2],
+    }
+
+
+#-----------------------------------------------------Phase 3 SQL----------------------------------------------------------------------#
+
+# Date query 2 uses when the client does not send one
+QUERY2_DEFAULT_DATE = "2025-10-10"
+
+# query2's range mode: longest range one request may cover, and how many ranks per day it may ask for
+QUERY2_MAX_RANGE_DAYS = 366
+QUERY2_DEFAULT_TOP = 1
+QUERY2_MAX_TOP = 50
+
+# query1 accepts up to this many tags in one request
+MAX_QUERY1_TAGS = 8
+
+
+class QueryRequestError(Exception):
+    """Raised by the Phase 3 request parsers with the message to send back as a 400"""
+
+
+def parse_query1_tags(data):
+    """
+    Tags query1 must find on one user's blogs from the same day, one blog per tag: "tags": [...],
+    or the original "tagA" and "tagB". A tag listed twice needs two different blogs carrying it
+    """
+    tags = data.get("tags")
+    if tags is None:
+        tags = [data.get("tagA"), data.get("tagB")]
+    if not isinstance(tags, list):
+        raise QueryRequestError("tags must be a list")
+
+    tags = [str(tag) for tag in tags if tag]
+    if len(tags) < 2:
+        raise QueryRequestError("At least two tags are required (tags, or tagA and tagB)")
+    if len(tags) > MAX_QUERY1_TAGS:
+        raise QueryRequestError(f"At most {MAX_QUERY1_TAGS} tags can be requested")
+    return tags
+
+
+# Each requested tag is a range scan of user_day_tags' primary key, the (username, day) groups that hold every
+# tag on enough different blogs are the candidates, and for those the blog ids carrying each tag come back so
+# query1_users can check each tag gets a blog of its own
+QUERY1_SQL = """
+    WITH candidates AS (
+        SELECT username, day
+        FROM user_day_tags
+        WHERE tag = ANY (%s)
+        GROUP BY username, day
+        HAVING COUNT(DISTINCT tag) = %s
+           AND COUNT(DISTINCT blog_id) >= %s
+    )
+    SELECT a.username, a.firstname, a.lastname, c.day, u.tag, ARRAY_AGG(u.blog_id)
+    FROM candidates c
+    JOIN user_day_tags u
+      ON u.username = c.username
+     AND u.day = c.day
+     AND u.tag = ANY (%s)
+    JOIN auth a
+      ON a.username = c.username
+    GROUP BY a.username, a.firstname, a.lastname, c.day, u.tag
+"""
+
+
+def query1_params(tags):
+    return (tags, len(set(tags)), len(tags), tags)
+
+
+def has_distinct_blogs(tags, blogs_by_tag):
+    """
+    Whether every tag in tags (repeats included) can be given a different blog out of blogs_by_tag[tag]
+    Bipartite matching with augmenting paths, a handful of tags and blogs per candidate day
+    """
+    owner = {}  # blog_id -> index into tags of the tag it is currently given to
+
+    def assign(i, seen):
+        for blog_id in blogs_by_tag.get(tags[i], ()):
+            if blog_id in seen:
+                continue
+            seen.add(blog_id)
+            if blog_id not in owner or assign(owner[blog_id], seen):
+                owner[blog_id] = i
+                return True
+        return False
+
+    return all(assign(i, set()) for i in range(len(tags)))
+
+
+def query1_users(tags, rows):
+    """Users from QUERY1_SQL rows with at least one day where the tags are on different blogs, ordered by username"""
+    days = {}
+    for username, firstname, lastname, day, tag, blog_ids in rows:
+        user = (username, firstname, lastname)
+        days.setdefault((user, day), {})[tag] = blog_ids
+
+    users = {user for (user, _), blogs_by_tag in days.items() if has_distinct_blogs(tags, blogs_by_tag)}
+    return [user_row_to_dict(user) for user in sorted(users)]
+
+
+QUERY2_SQL = """
+    WITH counts AS (
+        SELECT 
+            username,
+            COUNT(*) AS blog_count
+        FROM blogs
+        WHERE created_at >= %s::date
+          AND created_at < %s::date + 1
+        GROUP BY username
+    ),
+    max_count AS (
+        SELECT MAX(blog_count) AS max_blog_count
+        FROM counts
+    )
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname,
+        c.blog_count
+    FROM counts c
+    JOIN max_count m
+      ON c.blog_count = m.max_blog_count
+    JOIN auth a
+      ON a.username = c.username;
+"""
+
+# Range mode of query2: the top K users of every day in [start, end], ties included (RANK, not ROW_NUMBER)
+# The whole range is one scan of the created_at index, which includes username so the counts never touch the table
+QUERY2_RANGE_SQL = """
+    WITH counts AS (
+        SELECT
+            DATE(created_at) AS day,
+            username,
+            COUNT(*) AS blog_count
+        FROM blogs
+        WHERE created_at >= %s::date
+          AND created_at < %s::date + 1
+        GROUP BY 1, 2
+    ),
+    ranked AS (
+        SELECT
+            day,
+            username,
+            blog_count,
+            RANK() OVER (PARTITION BY day ORDER BY blog_count DESC) AS rank
+        FROM counts
+    )
+    SELECT
+        r.day,
+        r.rank,
+        a.username,
+        a.firstname,
+        a.lastname,
+        r.blog_count
+    FROM ranked r
+    JOIN auth a
+      ON a.username = r.username
+    WHERE r.rank <= %s
+    ORDER BY r.day, r.rank, a.username;
+"""
+
+
+def query2_params(target_date):
+    return (target_date, target_date)
+
+
+def parse_query2_range(args):
+    """
+    Reads start, end (YYYY-MM-DD) and top from query2's query string
+    Returns None when neither start nor end was sent (single date mode), raises QueryRequestError if any is invalid
+    """
+    start = args.get("start")
+    end = args.get("end")
+    if not start and not end:
+        return None
+
+    try:
+        start = date.fromisoformat(start or end)
+        end = date.fromisoformat(end or start.isoformat())
+    except (TypeError, ValueError):
+        raise QueryRequestError("start and end must be dates formatted YYYY-MM-DD")
+
+    if end < start:
+        raise QueryRequestError("end must not be before start")
+    if (end - start).days >= QUERY2_MAX_RANGE_DAYS:
+        raise QueryRequestError(f"A range can cover at most {QUERY2_MAX_RANGE_DAYS} days")
+
+    try:
+        top = int(args.get("top") or QUERY2_DEFAULT_TOP)
+    except (TypeError, ValueError):
+        raise QueryRequestError("top must be a number")
+
+    return {"start": start, "end": end, "top": max(1, min(top, QUERY2_MAX_TOP))}
+
+
+def query2_range_params(date_range):
+    return (date_range["start"], date_range["end"], date_range["top"])
+
+
+def query2_range_response(date_range, rows):
+    """Groups QUERY2_RANGE_SQL rows by day, days without any blog are left out"""
+    days = {}
+    for day, rank, username, firstname, lastname, blog_count in rows:
+        days.setdefault(day, []).append({
+            "username": username,
+            "firstname": firstname,
+            "lastname": lastname,
+            "blog_count": blog_count,
+            "rank": rank,
+        })
+
+    return {
+        "start": date_range["start"],
+        "end": date_range["end"],
+        "top": date_range["top"],
+        "days": [{"date": day, "users": users} for day, users in days.items()],
+    }
+
+
+# Users followed by every one of the users in the array parameter, the second parameter is how many there are
+# The follows primary key makes (follower, followed) unique, so COUNT(*) needs no DISTINCT
+QUERY3_SQL = """
+    WITH common_followed AS (
+        SELECT 
+            followed_username
+        FROM follows
+        WHERE follower_username = ANY(%s)
+        GROUP BY followed_username
+        HAVING COUNT(*) = %s
+    )
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname
+    FROM common_followed cf
+    JOIN auth a
+      ON a.username = cf.followed_username
+    ORDER BY a.username;
+"""
+
+
+def query3_params(usernames):
+    """Parameters for QUERY3_SQL, usernames must not repeat"""
+    return (list(usernames), len(usernames))
+
+
+QUERY4_SQL = """
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname
+    FROM auth a
+    LEFT JOIN blogs b
+      ON b.username = a.username
+    WHERE b.blog_id IS NULL;
+"""
+
+# Tables query 4 reads, its cached result is dropped when any of them is written to
+QUERY4_TABLES = ("auth", "blogs")
+
+QUERY5_SQL = """
+    SELECT 
+        b.blog_id,
+        b.username,
+        b.subject,
+        b.description,
+        b.tags,
+        b.created_at
+    FROM blog_sentiment_stats s
+    JOIN blogs b
+      ON b.blog_id = s.blog_id
+    WHERE s.username = %s
+      -- must have at least one comment, and none of them Negative
+      AND s.positive_count > 0
+      AND s.negative_count = 0;
+"""
+
+QUERY6_SQL = """
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname
+    FROM user_comment_stats s
+    JOIN auth a
+      ON a.username = s.username
+    WHERE s.negative_given > 0
+      AND s.positive_given = 0;
+"""
+
+# Tables query 6 reads, its cached result is dropped when any of them is written to
+QUERY6_TABLES = ("auth", "comments")
+
+QUERY7_SQL = """
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname
+    FROM user_comment_stats s
+    JOIN auth a
+      ON a.username = s.username
+    WHERE s.blog_count > 0
+      AND s.negative_received = 0;
+"""
+
+# Tables query 7 reads, its cached result is dropped when any of them is written to
+QUERY7_TABLES = ("auth", "blogs", "comments")
+
+
+#-----------------------------------------------------Follow Graph SQL----------------------------------------------------------------------#
+
+# Most users one common followees request may name, each one is a follower list to intersect
+MAX_COMMON_FOLLOWEE_USERS = 16
+
+
+def encode_username_cursor(username):
+    """Opaque token for the last username on a followers/following page, see encode_cursor"""
+    return base64.urlsafe_b64encode(json.dumps([username]).encode()).decode().rstrip('=')
+
+
+def decode_username_cursor(cursor):
+    """Decodes a token made by encode_username_cursor, returns None if the token is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        username, = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return username if isinstance(username, str) else None
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_follow_page(args):
+    """
+    Reads limit and cursor from a followers/following request's query string
+    Raises QueryRequestError with the message to send back as a 400
+    """
+    limit = parse_page_limit(args.get("limit"))
+    if limit is None:
+        raise QueryRequestError("limit must be a number")
+
+    raw_cursor = args.get("cursor")
+    after = None
+    if raw_cursor:
+        after = decode_username_cursor(str(raw_cursor))
+        if after is None:
+            raise QueryRequestError("Invalid cursor")
+
+    return {"limit": limit, "after": after}
+
+
+def parse_common_followee_users(raw_users):
+    """
+    Reads the users whose common followees are wanted, a list or a comma separated string
+    Returns them without duplicates in the order given, raises QueryRequestError with the message for a 400
+    """
+    if isinstance(raw_users, str):
+        raw_users = raw_users.split(",")
+    if not isinstance(raw_users, list):
+        raise QueryRequestError("users must be a list of usernames")
+
+    usernames = list(dict.fromkeys(str(user).strip() for user in raw_users if str(user).strip()))
+    if len(usernames) < 2:
+        raise QueryRequestError("At least two different users are required")
+    if len(usernames) > MAX_COMMON_FOLLOWEE_USERS:
+        raise QueryRequestError(f"At most {MAX_COMMON_FOLLOWEE_USERS} users are allowed")
+    return usernames
+
+
+# Both pages seek past the cursor on an index whose leading column is the user the page belongs to:
+# the follows primary key (follower, followed) for following, idx_follows_followed_follower for followers
+# Callers fetch limit + 1 rows so they know whether there is a next page, like /search
+FOLLOWING_SQL = """
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname,
+        f.created_at
+    FROM follows f
+    JOIN auth a
+      ON a.username = f.followed_username
+    WHERE f.follower_username = %s
+      AND (%s::varchar IS NULL OR f.followed_username > %s::varchar)
+    ORDER BY f.followed_username
+    LIMIT %s
+"""
+
+FOLLOWERS_SQL = """
+    SELECT 
+        a.username,
+        a.firstname,
+        a.lastname,
+        f.created_at
+    FROM follows f
+    JOIN auth a
+      ON a.username = f.follower_username
+    WHERE f.followed_username = %s
+      AND (%s::varchar IS NULL OR f.follower_username > %s::varchar)
+    ORDER BY f.follower_username
+    LIMIT %s
+"""
+
+FOLLOW_SQL = """
+    INSERT INTO follows (follower_username, followed_username)
+    VALUES (%s, %s)
+    ON CONFLICT DO NOTHING
+    RETURNING created_at
+"""
+
+UNFOLLOW_SQL = """
+    DELETE FROM follows
+    WHERE follower_username = %s AND followed_username = %s
+    RETURNING 1
+"""
+
+# Followee lists of several users in one round trip, for the follow graph cache (follow_graph.py)
+FOLLOWEES_OF_SQL = """
+    SELECT follower_username, followed_username
+    FROM follows
+    WHERE follower_username = ANY(%s)
+"""
+
+USERS_BY_USERNAME_SQL = """
+    SELECT 
+        username,
+        firstname,
+        lastname
+    FROM auth
+    WHERE username = ANY(%s)
+    ORDER BY username
+"""
+
+
+def follow_page_params(username, page):
+    """Parameters for FOLLOWING_SQL/FOLLOWERS_SQL, page is a dict returned by parse_follow_page"""
+    return (username, page["after"], page["after"], page["limit"] + 1)
+
+
+def follow_page_response(username, page, rows):
+    """Builds the followers/following JSON payload from the rows FOLLOWING_SQL/FOLLOWERS_SQL returned"""
+    limit = page["limit"]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "username": username,
+        "count": len(rows),
+        "limit": limit,
+        "next_cursor": encode_username_cursor(rows[-1][0]) if has_more else None,
+        "users": [{**user_row_to_dict(row), "followed_at": row[3]} for row in rows],
+    }
+
+
+#-----------------------------------------------------Feed SQL----------------------------------------------------------------------#
+
+def parse_feed_request(args):
+    """
+    Reads limit and cursor from a /feed request's query string, the cursor is the one search pages use
+    Raises QueryRequestError with the message to send back as a 400
+    """
+    limit = parse_page_limit(args.get("limit"))
+    if limit is None:
+        raise QueryRequestError("limit must be a number")
+
+    raw_cursor = args.get("cursor")
+    after = None
+    if raw_cursor:
+        after = decode_cursor(str(raw_cursor))
+        if after is None:
+            raise QueryRequestError("Invalid cursor")
+
+    return {"limit": limit, "after": after}
+
+
+# A page of the viewer's home feed, newest first (see create_feed_timelines in blog.py):
+#   - blogs pushed into the viewer's timelines rows when they were posted, one range scan of its primary key
+#   - merged with the newest blogs of the few followed authors in feed_pull_authors, which have too many followers
+#     to push to, each one range scan of idx_blogs_username_created_at
+# Neither half depends on how many users the viewer follows. A pull author's older blogs may also still be in
+# timelines from before they crossed the threshold, UNION drops the duplicates
+# Callers fetch limit + 1 rows so they know whether there is a next page, like /search
+FEED_SQL = """
+    WITH page AS (
+        (
+            SELECT t.blog_id, t.created_at
+            FROM timelines t
+            WHERE t.username = %s
+              AND (%s::timestamptz IS NULL OR (t.created_at, t.blog_id) < (%s::timestamptz, %s::bigint))
+            ORDER BY t.created_at DESC, t.blog_id DESC
+            LIMIT %s
+        )
+        UNION
+        (
+            SELECT pulled.blog_id, pulled.created_at
+            FROM feed_pull_authors p
+            CROSS JOIN LATERAL (
+                SELECT b.blog_id, b.created_at
+                FROM blogs b
+                WHERE b.username = p.username
+                  AND b.created_at IS NOT NULL
+                  AND (%s::timestamptz IS NULL OR (b.created_at, b.blog_id) < (%s::timestamptz, %s::bigint))
+                ORDER BY b.created_at DESC, b.blog_id DESC
+                LIMIT %s
+            ) pulled
+            WHERE EXISTS (
+                SELECT 1 FROM follows f
+                WHERE f.follower_username = %s AND f.followed_username = p.username
+            )
+        )
+    )
+    SELECT 
+        b.blog_id,
+        b.username,
+        b.subject,
+        b.description,
+        b.tags,
+        b.created_at
+    FROM page
+    JOIN blogs b
+      ON b.blog_id = page.blog_id
+    ORDER BY page.created_at DESC, page.blog_id DESC
+    LIMIT %s
+"""
+
+def feed_params(username, feed):
+    """Parameters for FEED_SQL, feed is a dict returned by parse_feed_request"""
+    after = feed["after"]
+    after_at = after[0] if after else None
+    after_id = after[1] if after else None
+    fetch = feed["limit"] + 1
+    return (username, after_at, after_at, after_id, fetch, after_at, after_at, after_id, fetch, username, fetch)
+
+
+def feed_response(feed, rows):
+    """Builds the /feed JSON payload from the rows FEED_SQL returned"""
+    limit = feed["limit"]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last[5], last[0])
+
+    return {
+        "count": len(rows),
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "blogs": [blog_row_to_dict(row) for row in rows],
+    }
@@ -0,0 +1,42 @@
+#---------------------Libraries and packages here---------------------------#
+
+from flask import g, session, make_response
+from functools import wraps
+from db_conn import db_pool, read_pool
+from server_config import READ_YOUR_WRITES_SECONDS, WROTE_AT_SESSION_KEY, pinned_to_primary
+import time
+#----------------------------------------------------------------------------#
+
+
+# Per-route read/write designation for the optional read replica (see server_config.py)
+#
+#   @read_only   the route only reads, its queries go to the replica unless the session wrote in the last
+#                READ_YOUR_WRITES_SECONDS, in which case they stay on the primary
+#   @writes      the route writes, a successful response starts the session's read-your-writes window
+#
+# Routes with neither always use the primary. Either way a route gets its pool from request_pool(), and without
+# DB_READ_HOST set that is always db_pool.
+
+
+def request_pool():
+    """The pool the current request's queries should use"""
+    return g.get("db_pool", db_pool)
+
+
+def read_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if read_pool is not None and not pinned_to_primary(session.get(WROTE_AT_SESSION_KEY)):
+            g.db_pool = read_pool
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def writes(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if read_pool is not None and READ_YOUR_WRITES_SECONDS > 0 and response.status_code < 400:
+            session[WROTE_AT_SESSION_KEY] = time.time()
+        return response
+    return wrapper
@@ -0,0 +1,133 @@
+#---------------------Libraries and packages here---------------------------#
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime
+import gzip
+import json
+import os
+
+# orjson and brotli are optional, without them responses fall back to the stdlib encoder and gzip only
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+#----------------------------------------------------------------------------#
+
+
+# Responses smaller than this many bytes go out uncompressed, compressing them costs more than it saves
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html"}
+
+
+def default(obj):
+    # Timestamps go out as ISO 8601, the same format the routes produced with .isoformat()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider used by jsonify
+    Encodes with orjson when it is installed, which serializes datetimes natively and runs several times faster
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault("default", default)
+        kwargs.setdefault("ensure_ascii", False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Compact output, skips the stdlib provider's pretty printing in debug mode
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj), mimetype=self.mimetype)
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Parses an Accept-Encoding header into {coding: q}, ex: "br;q=0, gzip" -> {"br": 0.0, "gzip": 1.0}
+    A q that isn't a number counts as 0, the coding is refused rather than guessed at
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks brotli over gzip among the codings the client accepts with q > 0, None if it accepts neither
+    A * entry covers the codings the header doesn't name, so "*;q=0" refuses both unless one is listed
+    """
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response):
+    """after_request hook, compresses large bodies for clients that accept it"""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", "").lower())
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_serialization(app):
+    """Installs the fast JSON provider and response compression on app"""
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -0,0 +1,119 @@
+import os
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
+
+
+# Serving settings shared by gunicorn.conf.py and db_conn.py, so the connection pool is sized from the same numbers
+# that decide how many requests run at once
+#
+#   WORKER_CLASS        sync | gthread | gevent
+#   WEB_WORKERS         worker processes, each one gets its own connection pool
+#   WEB_THREADS         threads per worker (gthread only)
+#   WORKER_CONNECTIONS  concurrent greenlets per worker (gevent only)
+#   DB_MAX_CONNECTIONS  connections the whole deployment may open, split evenly across workers
+#   ASYNC_DB_CONNECTIONS  the part of DB_MAX_CONNECTIONS set aside for the async app (asgi.py), 0 when it isn't run,
+#                         the gunicorn workers share the rest
+#   ASYNC_WORKERS       hypercorn worker processes of the async app, each one gets its share of ASYNC_DB_CONNECTIONS
+
+WORKER_CLASS = os.getenv("WORKER_CLASS", "gthread").lower()
+WEB_WORKERS = max(1, int(os.getenv("WEB_WORKERS", str(min(4, (os.cpu_count() or 1) * 2 + 1)))))
+WEB_THREADS = max(1, int(os.getenv("WEB_THREADS", "8")))
+WORKER_CONNECTIONS = max(1, int(os.getenv("WORKER_CONNECTIONS", "100")))
+DB_MAX_CONNECTIONS = max(1, int(os.getenv("DB_MAX_CONNECTIONS", "40")))
+ASYNC_DB_CONNECTIONS = max(0, int(os.getenv("ASYNC_DB_CONNECTIONS", "0")))
+ASYNC_WORKERS = max(1, int(os.getenv("ASYNC_WORKERS", "2")))
+
+# What is left of the budget for the gunicorn workers
+WEB_DB_CONNECTIONS = DB_MAX_CONNECTIONS - ASYNC_DB_CONNECTIONS
+
+WORKER_CLASSES = {"sync", "gthread", "gevent"}
+
+# All possible hosts for the frontend, and the headers CORS lets through, used by both app.py and asgi.py
+ALLOWED_ORIGINS = [
+    os.getenv("FRONTEND_ORIGIN", "http://localhost:3000"),
+    "http://127.0.0.1:3000",
+    "http://localhost:5173",
+    "http://127.0.0.1:5173",
+]
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "X-Admin-Token", "If-None-Match"]
+CORS_EXPOSE_HEADERS = ["Content-Type", "ETag"]
+
+# Seconds clients are told to wait (Retry-After) when no database connection frees up in time, used by both apps
+DB_POOL_RETRY_AFTER = int(os.getenv("DB_POOL_RETRY_AFTER", "1"))
+
+# Optional read replica, turned on by setting DB_READ_HOST. Routes marked read_only (routing.py) and the async app
+# read from it, everything else stays on the primary
+#   DB_READ_HOST, DB_READ_PORT, DB_READ_NAME, DB_READ_USER, DB_READ_PASS, DB_READ_SSLMODE
+#                             replica connection settings, each one not set falls back to the primary's DB_* value
+#   READ_YOUR_WRITES_SECONDS  after a session writes, its reads stay on the primary this long so replication lag
+#                             never hides its own post or comment from it, 0 turns this off
+READ_REPLICA_ENABLED = bool(os.getenv("DB_READ_HOST"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Session key holding the time of the session's last write
+WROTE_AT_SESSION_KEY = "db_wrote_at"
+
+if WORKER_CLASS not in WORKER_CLASSES:
+    raise ValueError(f"WORKER_CLASS must be one of: {', '.join(sorted(WORKER_CLASSES))}")
+
+# Every worker needs at least one connection, rounding each pool up to one would go over the budget
+if WEB_WORKERS > WEB_DB_CONNECTIONS:
+    raise ValueError(
+        f"WEB_WORKERS ({WEB_WORKERS}) is more than the {WEB_DB_CONNECTIONS} connections DB_MAX_CONNECTIONS "
+        f"({DB_MAX_CONNECTIONS}) leaves after ASYNC_DB_CONNECTIONS ({ASYNC_DB_CONNECTIONS}), "
+        f"lower WEB_WORKERS or raise DB_MAX_CONNECTIONS"
+    )
+
+
+def worker_concurrency():
+    """How many requests one worker process can have in flight at once"""
+    if WORKER_CLASS == "gthread":
+        return WEB_THREADS
+    if WORKER_CLASS == "gevent":
+        return WORKER_CONNECTIONS
+    return 1
+
+
+def pool_maxconn():
+    """
+    maxconn for one worker's pool
+    A request holds at most one connection at a time, so a worker never needs more than its concurrency,
+    and all workers together must stay within their part of DB_MAX_CONNECTIONS
+    """
+    return min(worker_concurrency(), WEB_DB_CONNECTIONS // WEB_WORKERS)
+
+
+def async_pool_maxconn():
+    """
+    max_size for one async worker's pool, its share of ASYNC_DB_CONNECTIONS
+    Only called by async_db.py, so the Flask app runs fine without the async app's share configured
+    """
+    if ASYNC_WORKERS > ASYNC_DB_CONNECTIONS:
+        raise ValueError(
+            f"The async app needs ASYNC_DB_CONNECTIONS (now {ASYNC_DB_CONNECTIONS}) set to at least "
+            f"ASYNC_WORKERS ({ASYNC_WORKERS}), taken out of DB_MAX_CONNECTIONS"
+        )
+    return ASYNC_DB_CONNECTIONS // ASYNC_WORKERS
+
+
+def read_replica_settings():
+    """Connection settings for the read replica, from DB_READ_* with the primary's DB_* as fallback"""
+    def setting(name, default=None):
+        return os.getenv(f"DB_READ_{name}", os.getenv(f"DB_{name}", default))
+
+    return {
+        "dbname": setting("NAME"),
+        "user": setting("USER"),
+        "password": setting("PASS"),
+        "host": setting("HOST"),
+        "port": setting("PORT"),
+        "sslmode": setting("SSLMODE", "require"),
+    }
+
+
+def pinned_to_primary(wrote_at):
+    """Whether a session that last wrote at wrote_at (epoch seconds, or None) must still read from the primary"""
+    return wrote_at is not None and time.time() - wrote_at < READ_YOUR_WRITES_SECONDS
@@ -0,0 +1,185 @@
+#---------------------Libraries and packages here---------------------------#
+
+import psycopg2 as pg
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import json
+import os
+import re
+import threading
+import time
+#----------------------------------------------------------------------------#
+
+
+# Slow query log, fed by metrics.InstrumentedCursor for every statement run on a pooled connection
+#
+#   SLOW_QUERY_MS             statements slower than this many milliseconds are logged, 0 turns the log off
+#   SLOW_QUERY_LOG            file to append the log to (one JSON object per line), stdout if unset
+#   SLOW_QUERY_EXPLAIN        1 to also capture EXPLAIN (ANALYZE, BUFFERS) of a slow statement
+#   SLOW_QUERY_EXPLAIN_EVERY  seconds before the same statement is explained again
+#
+# Parameters are never logged, only their type and length, since they hold usernames, emails and password hashes.
+# psycopg2 fills parameters in client side, so EXPLAIN sees them as literals and repeats them in Index Cond, Filter
+# and the like: every quoted literal in a captured plan (and its error, if any) is replaced by '?' before logging.
+# Statements run through prepared.py are logged as their registered SQL, not as EXECUTE name (...).
+#
+# EXPLAIN ANALYZE runs the statement again, so it is done in the background on a connection of its own (never one
+# from the pool) inside a READ ONLY transaction that is always rolled back: writes like create_blog fail harmlessly
+# there instead of running twice. Only one runs at a time and a few more may queue, the rest are dropped.
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+SLOW_QUERY_EXPLAIN_EVERY = float(os.getenv("SLOW_QUERY_EXPLAIN_EVERY", "300"))
+
+EXPLAIN_QUEUE_LIMIT = 8
+EXPLAIN_STATEMENT_TIMEOUT_MS = 30_000
+
+_EXECUTE = re.compile(r"\s*EXECUTE\s+(\w+)", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+_log_lock = threading.Lock()
+
+
+def redact(value):
+    """Describes a parameter without its value, ex: <str:12>, <list:3>, NULL"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def scrub_literals(value):
+    """Replaces every quoted SQL literal in value, and in the strings nested in it, with '?'"""
+    if isinstance(value, str):
+        return _STRING_LITERAL.sub("'?'", value)
+    if isinstance(value, dict):
+        return {key: scrub_literals(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub_literals(item) for item in value]
+    return value
+
+
+def resolve_statement(query):
+    """Turns EXECUTE name (...) back into the registered SQL, returns (sql, prepared statement name or None)"""
+    if isinstance(query, bytes):
+        query = query.decode()
+
+    match = _EXECUTE.match(query)
+    if match:
+        from prepared import STATEMENTS
+        name = match.group(1)
+        if name in STATEMENTS:
+            return STATEMENTS[name][0], name
+    return query, None
+
+
+def write_entry(entry):
+    line = json.dumps(entry, default=str)
+    with _log_lock:
+        if SLOW_QUERY_LOG:
+            with open(SLOW_QUERY_LOG, "a") as f:
+                f.write(line + "\n")
+        else:
+            print("[SLOW_QUERY]", line)
+
+
+def record(query, params, seconds, route):
+    """Called by InstrumentedCursor after every statement, logs it if it took longer than SLOW_QUERY_MS"""
+    duration_ms = seconds * 1000
+    if SLOW_QUERY_MS <= 0 or duration_ms < SLOW_QUERY_MS:
+        return
+
+    sql, statement = resolve_statement(query)
+    if isinstance(params, dict):
+        redacted = {key: redact(value) for key, value in params.items()}
+    else:
+        redacted = [redact(value) for value in params or ()]
+
+    write_entry({
+        "event": "slow_query",
+        "at": datetime.now(timezone.utc).isoformat(),
+        "route": route,
+        "statement": statement,
+        "duration_ms": round(duration_ms, 3),
+        "sql": " ".join(sql.split()),
+        "params": redacted,
+    })
+
+    if SLOW_QUERY_EXPLAIN:
+        explainer.submit(sql, params, statement, route)
+
+
+#---------------------------------------------------------EXPLAIN Capture---------------------------------------------------------------#
+
+class Explainer:
+    """Runs EXPLAIN (ANALYZE, BUFFERS) of slow statements on one background thread with its own connection"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+        self._slots = threading.BoundedSemaphore(EXPLAIN_QUEUE_LIMIT)
+        self._last_explained = {}  # sql -> monotonic time
+        self._lock = threading.Lock()
+        self._conn = None  # only touched by the executor's thread
+
+    def submit(self, sql, params, statement, route):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_explained.get(sql)
+            if last is not None and now - last < SLOW_QUERY_EXPLAIN_EVERY:
+                return
+            self._last_explained[sql] = now
+
+        if not self._slots.acquire(blocking=False):
+            return
+        future = self._executor.submit(self._explain, sql, params, statement, route)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self._slots.release()
+        # Anything _explain didn't turn into an error entry, ex: the log file can't be written
+        error = future.exception()
+        if error is not None:
+            print("[SLOW_QUERY] EXPLAIN capture failed:", repr(error))
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            # Imported here, db_conn imports metrics which imports this module
+            from db_conn import PRIMARY_SETTINGS
+            self._conn = pg.connect(**PRIMARY_SETTINGS, connect_timeout=10)
+            self._conn.set_session(readonly=True, autocommit=False)
+            with self._conn.cursor() as cur:
+                cur.execute("SET statement_timeout = %s", (EXPLAIN_STATEMENT_TIMEOUT_MS,))
+            self._conn.commit()
+        return self._conn
+
+    def _explain(self, sql, params, statement, route):
+        entry = {
+            "event": "slow_query_plan",
+            "at": datetime.now(timezone.utc).isoformat(),
+            "route": route,
+            "statement": statement,
+            "sql": " ".join(sql.split()),
+        }
+
+        try:
+            conn = self._connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params or None)
+                    entry["plan"] = scrub_literals(cur.fetchone()[0][0])
+            finally:
+                conn.rollback()
+        except pg.Error as e:
+            entry["error"] = scrub_literals(str(e).strip())
+            if self._conn is not None and self._conn.closed:
+                self._conn = None
+        # Ex: a TypeError from psycopg2 filling in params, still logged rather than lost in the future
+        except Exception as e:
+            entry["error"] = scrub_literals(f"{type(e).__name__}: {e}")
+
+        write_entry(entry)
+
+
+explainer = Explainer()